@@ -0,0 +1,39 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+
+from app.app.core.dependencies import get_geojson_tiles
+from app.app.core.geojson_tiles import LAYERS, GeoJSONTiles, negotiate_encoding
+from app.app.core.http_cache import cache_headers, etag_matches
+
+router = APIRouter()
+
+
+@router.get("/{layer}")
+def read_boundaries(
+    layer: str,
+    zoom: float = Query(12, ge=0, le=24),
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    geojson_tiles: Optional[GeoJSONTiles] = Depends(get_geojson_tiles),
+) -> Response:
+    if layer not in LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown layer: {layer}")
+    if geojson_tiles is None:
+        raise HTTPException(status_code=503, detail="Boundaries are not available")
+
+    document = geojson_tiles.get(layer, zoom)
+    encoding = negotiate_encoding(accept_encoding, list(document.bodies))
+    etag = document.etags[encoding]
+    headers = {**cache_headers(etag), "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    # Sent as compressed at startup, without copying or compressing again
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(
+        content=document.bodies[encoding],
+        media_type="application/geo+json",
+        headers=headers,
+    )
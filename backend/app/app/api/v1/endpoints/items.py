@@ -1,16 +1,95 @@
+import json
 import logging
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 
-from app.app.core.dependencies import get_models_and_spaces
-from app.app.core.prediction import predict_parking_availability
-from app.app.schemas.input import DateTime, Location
-from app.app.schemas.output import ParkingResult
+from app.app.core.cache import LRUCache
+from app.app.core.config import settings
+from app.app.core.dependencies import (
+    ServingState,
+    get_inference_executor,
+    get_micro_batcher,
+    get_prediction_cache,
+    get_serving_state,
+    get_snapshot_cache,
+    get_spatial_index,
+    is_data_loaded,
+)
+from app.app.core.forecast_grid import current_hour, to_local_time
+from app.app.core.http_cache import (
+    cache_headers,
+    etag_matches,
+    make_etag,
+    spaces_fingerprint,
+)
+from app.app.core.inference_executor import InferenceExecutor
+from app.app.core.metrics import STAGE_DURATION
+from app.app.core.micro_batcher import MicroBatcher
+from app.app.core.prediction import (
+    find_best_parking_times,
+    iter_parking_availability_curve,
+    predict_parking_availability,
+    predict_parking_availability_batch,
+    predict_parking_availability_snapshot,
+    rank_neighbourhoods_by_availability,
+)
+from app.app.core.spatial_index import SpatialIndex
+from app.app.schemas.input import (
+    BatchPredictionRequest,
+    CurveFormat,
+    DateTime,
+    Location,
+)
+from app.app.schemas.output import (
+    BatchParkingResult,
+    BestTimeResult,
+    NearestResult,
+    NeighbourhoodLocation,
+    ParkingResult,
+    SnapshotResult,
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def _models_loading(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)},
+    )
+
+
+def _check_ready(
+    neighbourhood_ids: List[str], models: dict, spaces_dict: dict, data_loaded: bool
+) -> None:
+    """Reject requests for neighbourhoods without a model: as not ready yet
+    (503) while the models are still loading, as unknown (404) afterwards."""
+    missing = [
+        neighbourhood_id
+        for neighbourhood_id in dict.fromkeys(neighbourhood_ids)
+        if neighbourhood_id not in models or neighbourhood_id not in spaces_dict
+    ]
+    if not missing:
+        return
+    if not data_loaded:
+        raise _models_loading(f"Models still loading for neighbourhood ids: {missing}")
+    raise HTTPException(status_code=404, detail=f"Unknown neighbourhood ids: {missing}")
+
+
+def _check_all_loaded(data_loaded: bool) -> None:
+    """Reject requests spanning every neighbourhood while the models are still
+    loading, rather than answering, and caching, a partial result."""
+    if not data_loaded:
+        raise _models_loading("Models still loading")
+
+
 @router.get(
     "/datetime/{datetime_str}/neighbourhood_id/{neighbourhood_id_str}",
     response_model=ParkingResult,
@@ -18,18 +97,331 @@ logger = logging.getLogger(__name__)
 def read_item(
     datetime_str: str,
     neighbourhood_id_str: str,
-    models_and_spaces: tuple = Depends(get_models_and_spaces),
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    serving_state: ServingState = Depends(get_serving_state),
+    micro_batcher: Optional[MicroBatcher] = Depends(get_micro_batcher),
+    inference_executor: InferenceExecutor = Depends(get_inference_executor),
+    prediction_cache: LRUCache = Depends(get_prediction_cache),
+    data_loaded: bool = Depends(is_data_loaded),
 ) -> ParkingResult:
     try:
-        DateTime(datetime=datetime_str)
-        Location(neighbourhood_id=neighbourhood_id_str)
+        with STAGE_DURATION.labels(stage="validation").time():
+            DateTime(datetime=datetime_str)
+            Location(neighbourhood_id=neighbourhood_id_str)
     except ValueError as e:
         logger.error(f"Validation error: {e}")
         raise HTTPException(status_code=400, detail=str(e)) from e
 
-    models, spaces_dict = models_and_spaces
+    # The prediction only changes with the model version and the spaces data
+    models, spaces_dict = serving_state.models, serving_state.spaces_dict
+    _check_ready([neighbourhood_id_str], models, spaces_dict, data_loaded)
+    # Published along with the model, so it is known even while warming up
+    version = serving_state.versions[neighbourhood_id_str]
+    # Predicted per local hour, so the ETag and the prediction always match
+    hour = _to_local_hour(datetime_str)
+    etag = make_etag(
+        "item",
+        neighbourhood_id_str,
+        version,
+        spaces_fingerprint(spaces_dict),
+        hour.isoformat(),
+    )
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+
     result = predict_parking_availability(
-        datetime_str, neighbourhood_id_str, models, spaces_dict
+        hour,
+        neighbourhood_id_str,
+        models,
+        spaces_dict,
+        serving_state.forecast_grid,
+        micro_batcher,
+        inference_executor,
+        prediction_cache,
     )
     logger.info(f"Prediction result: {result}")
+    response.headers.update(cache_headers(etag))
     return ParkingResult(**result)
+
+
+def _to_local_hour(value: str | datetime) -> pd.Timestamp:
+    return to_local_time(pd.Timestamp(value)).floor("h")
+
+
+def _to_local_hours(datetimes: List[datetime]) -> pd.DatetimeIndex:
+    # Floored like the single predictions, so both endpoints always agree
+    return pd.DatetimeIndex([_to_local_hour(dt) for dt in datetimes])
+
+
+@router.post("/batch", response_model=BatchParkingResult)
+def read_items_batch(
+    request: BatchPredictionRequest,
+    serving_state: ServingState = Depends(get_serving_state),
+    inference_executor: InferenceExecutor = Depends(get_inference_executor),
+    data_loaded: bool = Depends(is_data_loaded),
+) -> BatchParkingResult:
+    num_predictions = len(set(request.neighbourhood_ids)) * len(request.datetimes)
+    if num_predictions > settings.BATCH_MAX_PREDICTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch of {num_predictions} predictions exceeds the maximum of {settings.BATCH_MAX_PREDICTIONS}",
+        )
+
+    models, spaces_dict = serving_state.models, serving_state.spaces_dict
+    _check_ready(request.neighbourhood_ids, models, spaces_dict, data_loaded)
+
+    results = predict_parking_availability_batch(
+        _to_local_hours(request.datetimes),
+        request.neighbourhood_ids,
+        models,
+        spaces_dict,
+        serving_state.forecast_grid,
+        inference_executor,
+    )
+    logger.info(
+        f"Batch prediction for {len(results)} neighbourhoods and {len(request.datetimes)} datetimes"
+    )
+    return BatchParkingResult(results=results)
+
+
+@router.get("/snapshot/{datetime_str}", response_model=SnapshotResult)
+def read_snapshot(
+    datetime_str: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    serving_state: ServingState = Depends(get_serving_state),
+    snapshot_cache: LRUCache = Depends(get_snapshot_cache),
+    inference_executor: InferenceExecutor = Depends(get_inference_executor),
+    data_loaded: bool = Depends(is_data_loaded),
+) -> SnapshotResult:
+    try:
+        DateTime(datetime=datetime_str)
+    except ValueError as e:
+        logger.error(f"Validation error: {e}")
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    _check_all_loaded(data_loaded)
+
+    # Snapshots are computed and cached per hour
+    hour = _to_local_hour(datetime_str)
+    models, spaces_dict = serving_state.models, serving_state.spaces_dict
+    versions = serving_state.versions
+    etag = make_etag(
+        "snapshot",
+        json.dumps(versions, sort_keys=True),
+        spaces_fingerprint(spaces_dict),
+        hour.isoformat(),
+    )
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
+
+    # Cached by ETag, so a snapshot computed with models replaced by a reload
+    # in the meantime is never served
+    snapshot = snapshot_cache.get(etag)
+    if snapshot is None:
+        snapshot = SnapshotResult(
+            datetime=hour,
+            predictions=predict_parking_availability_snapshot(
+                hour,
+                models,
+                spaces_dict,
+                serving_state.forecast_grid,
+                inference_executor=inference_executor,
+            ),
+        )
+        snapshot_cache.set(etag, snapshot)
+    return snapshot
+
+
+def _curve_ndjson(
+    chunks: Iterator[Tuple[pd.DatetimeIndex, np.ndarray]],
+) -> Iterator[str]:
+    for datetimes, predictions in chunks:
+        yield "".join(
+            json.dumps({"datetime": dt.isoformat(), "prediction": prediction}) + "\n"
+            for dt, prediction in zip(datetimes, predictions.tolist())
+        )
+
+
+def _curve_columnar(
+    chunks: Iterator[Tuple[pd.DatetimeIndex, np.ndarray]],
+    neighbourhood_id_str: str,
+    barrio: str,
+    start: pd.Timestamp,
+) -> Iterator[str]:
+    # Hourly series, so the datetimes are implied by the start
+    header = json.dumps(
+        {
+            "neighbourhood_id": neighbourhood_id_str,
+            "barrio": barrio,
+            "start": start.isoformat(),
+            "freq": "h",
+        }
+    )
+    yield header[:-1] + ', "predictions": ['
+    separator = ""
+    for _, predictions in chunks:
+        yield separator + json.dumps(predictions.tolist())[1:-1]
+        separator = ", "
+    yield "]}"
+
+
+@router.get("/curve/neighbourhood_id/{neighbourhood_id_str}")
+def read_curve(
+    neighbourhood_id_str: str,
+    start: datetime,
+    end: datetime,
+    format: CurveFormat = CurveFormat.ndjson,
+    serving_state: ServingState = Depends(get_serving_state),
+    inference_executor: InferenceExecutor = Depends(get_inference_executor),
+    data_loaded: bool = Depends(is_data_loaded),
+) -> StreamingResponse:
+    start_hour = to_local_time(pd.Timestamp(start)).floor("h")
+    datetimes = pd.date_range(
+        start_hour, to_local_time(pd.Timestamp(end)), freq="h", inclusive="left"
+    )
+    if datetimes.empty:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if len(datetimes) > settings.CURVE_MAX_HOURS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Curve of {len(datetimes)} hours exceeds the maximum of {settings.CURVE_MAX_HOURS}",
+        )
+
+    models, spaces_dict = serving_state.models, serving_state.spaces_dict
+    _check_ready([neighbourhood_id_str], models, spaces_dict, data_loaded)
+
+    # Computed chunk by chunk while streaming, so long ranges start arriving
+    # before they are fully predicted
+    chunks = iter_parking_availability_curve(
+        datetimes,
+        neighbourhood_id_str,
+        models,
+        spaces_dict,
+        settings.CURVE_CHUNK_HOURS,
+        serving_state.forecast_grid,
+        inference_executor,
+    )
+    if format == CurveFormat.ndjson:
+        return StreamingResponse(
+            _curve_ndjson(chunks), media_type="application/x-ndjson"
+        )
+    return StreamingResponse(
+        _curve_columnar(
+            chunks,
+            neighbourhood_id_str,
+            spaces_dict[neighbourhood_id_str]["barrio"],
+            start_hour,
+        ),
+        media_type="application/json",
+    )
+
+
+@router.get(
+    "/best_time/neighbourhood_id/{neighbourhood_id_str}", response_model=BestTimeResult
+)
+def read_best_time(
+    neighbourhood_id_str: str,
+    start: Optional[datetime] = None,
+    hours: int = Query(24, ge=1),
+    top_k: int = Query(5, ge=1),
+    include_closed: bool = False,
+    serving_state: ServingState = Depends(get_serving_state),
+    inference_executor: InferenceExecutor = Depends(get_inference_executor),
+    data_loaded: bool = Depends(is_data_loaded),
+) -> BestTimeResult:
+    if hours > settings.BEST_TIME_MAX_HOURS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Search of {hours} hours exceeds the maximum of {settings.BEST_TIME_MAX_HOURS}",
+        )
+
+    models, spaces_dict = serving_state.models, serving_state.spaces_dict
+    _check_ready([neighbourhood_id_str], models, spaces_dict, data_loaded)
+
+    start_hour = (
+        current_hour() if start is None else to_local_time(pd.Timestamp(start))
+    ).floor("h")
+    slots = find_best_parking_times(
+        pd.date_range(start_hour, periods=hours, freq="h"),
+        neighbourhood_id_str,
+        models,
+        spaces_dict,
+        top_k,
+        include_closed,
+        serving_state.forecast_grid,
+        inference_executor,
+    )
+    return BestTimeResult(
+        neighbourhood_id=neighbourhood_id_str,
+        barrio=spaces_dict[neighbourhood_id_str]["barrio"],
+        slots=slots,
+    )
+
+
+def _require_spatial_index(
+    spatial_index: Optional[SpatialIndex] = Depends(get_spatial_index),
+) -> SpatialIndex:
+    if spatial_index is None:
+        raise HTTPException(
+            status_code=503, detail="Neighbourhood limits are not available"
+        )
+    return spatial_index
+
+
+@router.get("/location", response_model=NeighbourhoodLocation)
+def read_location(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    spatial_index: SpatialIndex = Depends(_require_spatial_index),
+) -> NeighbourhoodLocation:
+    neighbourhood = spatial_index.locate(lat, lon)
+    if neighbourhood is None:
+        raise HTTPException(status_code=404, detail=f"No neighbourhood at {lat}, {lon}")
+    return NeighbourhoodLocation(
+        neighbourhood_id=neighbourhood.neighbourhood_id,
+        barrio=neighbourhood.barrio,
+        district=neighbourhood.district,
+    )
+
+
+@router.get("/nearest", response_model=NearestResult)
+def read_nearest(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    datetime_str: Optional[str] = None,
+    radius_m: float = Query(1000, gt=0),
+    limit: int = Query(5, ge=1),
+    spatial_index: SpatialIndex = Depends(_require_spatial_index),
+    serving_state: ServingState = Depends(get_serving_state),
+    inference_executor: InferenceExecutor = Depends(get_inference_executor),
+    data_loaded: bool = Depends(is_data_loaded),
+) -> NearestResult:
+    if radius_m > settings.NEAREST_MAX_RADIUS_M:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Radius of {radius_m} m exceeds the maximum of {settings.NEAREST_MAX_RADIUS_M}",
+        )
+    try:
+        hour = current_hour() if datetime_str is None else _to_local_hour(datetime_str)
+    except ValueError as e:
+        logger.error(f"Validation error: {e}")
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    _check_all_loaded(data_loaded)
+
+    models, spaces_dict = serving_state.models, serving_state.spaces_dict
+    distances = {
+        neighbourhood.neighbourhood_id: distance
+        for neighbourhood, distance in spatial_index.nearest(lat, lon, radius_m)
+        if neighbourhood.neighbourhood_id in spaces_dict
+    }
+    ranked = rank_neighbourhoods_by_availability(
+        hour,
+        distances,
+        models,
+        spaces_dict,
+        serving_state.forecast_grid,
+        inference_executor,
+    )
+    return NearestResult(datetime=hour, neighbourhoods=ranked[:limit])
@@ -1,6 +1,9 @@
 from fastapi import APIRouter
 
-from app.app.api.v1.endpoints import items
+from app.app.api.v1.endpoints import boundaries, items
 
 api_router = APIRouter()
 api_router.include_router(items.router, prefix="/api/v1/items", tags=["items"])
+api_router.include_router(
+    boundaries.router, prefix="/api/v1/boundaries", tags=["boundaries"]
+)
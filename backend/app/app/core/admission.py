@@ -0,0 +1,171 @@
+import asyncio
+import time
+from typing import Callable, Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.app.core.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUE_WAIT,
+    ADMISSION_REJECTED,
+)
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request is shed instead of being queued."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionController:
+    """Limit the requests handled at once, shedding the ones that would wait
+    longer than `queue_timeout_seconds` for a slot.
+
+    Requests wait in the event loop rather than in the thread pool, so a burst
+    does not pile up behind slow inference calls. A request is rejected right
+    away when `max_queued` are already waiting, or when the queue ahead of it
+    would take longer than the budget given the recent service times; the
+    ones let in that still do not get a slot in time are rejected then.
+    """
+
+    # Weight of the last request in the moving average of the service time
+    SERVICE_TIME_SMOOTHING = 0.2
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queued: int,
+        queue_timeout_seconds: float,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.in_flight = 0
+        self.queued = 0
+        self.service_time: Optional[float] = None
+        self._semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency > 0
+
+    def _reject(self, reason: str) -> AdmissionRejectedError:
+        ADMISSION_REJECTED.labels(reason=reason).inc()
+        return AdmissionRejectedError(reason)
+
+    def expected_wait(self) -> float:
+        """Estimated seconds until a new request gets a slot."""
+        ahead = self.in_flight + self.queued - self.max_concurrency
+        if ahead < 0 or self.service_time is None:
+            return 0.0
+        return (ahead + 1) / self.max_concurrency * self.service_time
+
+    async def acquire(self) -> Optional[float]:
+        """Wait for a slot, or raise `AdmissionRejectedError`. Return the time
+        the slot was granted, to be passed to `release`."""
+        if not self.enabled:
+            return None
+        if self.in_flight + self.queued >= self.max_concurrency:
+            if self.in_flight + self.queued >= self.max_concurrency + self.max_queued:
+                raise self._reject("queue_full")
+            if self.expected_wait() > self.queue_timeout_seconds:
+                raise self._reject("queue_budget")
+
+        start = time.perf_counter()
+        self.queued += 1
+        try:
+            await asyncio.wait_for(
+                self._semaphore.acquire(), timeout=self.queue_timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            raise self._reject("queue_timeout") from None
+        finally:
+            self.queued -= 1
+        admitted = time.perf_counter()
+        ADMISSION_QUEUE_WAIT.observe(admitted - start)
+
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        return admitted
+
+    def release(self, admitted: Optional[float]) -> None:
+        if admitted is None:
+            return
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        self._semaphore.release()
+        elapsed = time.perf_counter() - admitted
+        self.service_time = (
+            elapsed
+            if self.service_time is None
+            else self.service_time
+            + self.SERVICE_TIME_SMOOTHING * (elapsed - self.service_time)
+        )
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting the HTTP requests under `path_prefix` through
+    the controller returned by `get_controller`.
+
+    The slot is held until the last chunk of the response body is sent or the
+    client disconnects, rather than until the response headers are returned,
+    so streamed responses count as in flight while their body is computed.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        get_controller: Callable[[], AdmissionController],
+        path_prefix: str,
+        retry_after_seconds: int,
+    ) -> None:
+        self.app = app
+        self.get_controller = get_controller
+        self.path_prefix = path_prefix
+        self.retry_after_seconds = retry_after_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.get_controller()
+        try:
+            admitted = await controller.acquire()
+        except AdmissionRejectedError as e:
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": f"Server overloaded ({e.reason}), retry later"},
+                headers={"Retry-After": str(self.retry_after_seconds)},
+            )
+            await response(scope, receive, send)
+            return
+
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                controller.release(admitted)
+
+        async def receive_until_disconnect() -> Message:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                release()
+            return message
+
+        async def send_until_complete(message: Message) -> None:
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                release()
+
+        try:
+            await self.app(scope, receive_until_disconnect, send_until_complete)
+        finally:
+            release()
@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.app.core.metrics import CACHE_EVICTIONS, record_cache_lookups
+
+
+class LRUCache:
+    """Thread-safe, bounded cache evicting the least recently used entry.
+
+    Entries older than `ttl_seconds` (if given) are dropped when read. Hits,
+    misses and evictions are counted, and also exported as metrics if the
+    cache has a `name`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_seconds: Optional[float] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Values are stored along with their insertion time
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evicted(self, reason: str) -> None:
+        self.evictions += 1
+        if self.name is not None:
+            CACHE_EVICTIONS.labels(cache=self.name, reason=reason).inc()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl_seconds is not None:
+                if time.monotonic() - entry[0] > self.ttl_seconds:
+                    del self._data[key]
+                    self._evicted("ttl")
+                    entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+        if self.name is not None:
+            record_cache_lookups(self.name, entry is not None, entry is None)
+        return None if entry is None else entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evicted("size")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
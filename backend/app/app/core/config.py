@@ -6,6 +6,67 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     BACKEND_CORS_ORIGINS: List[str] = Field(..., env="BACKEND_CORS_ORIGINS")
+    # Hours ahead precomputed in the forecast grid (0 disables it)
+    FORECAST_GRID_HORIZON_HOURS: int = Field(24 * 14, env="FORECAST_GRID_HORIZON_HOURS")
+    # Maximum number of (neighbourhood, datetime) pairs per batch request
+    BATCH_MAX_PREDICTIONS: int = Field(10_000, env="BATCH_MAX_PREDICTIONS")
+    # Number of hourly city-wide snapshots kept in memory
+    SNAPSHOT_CACHE_SIZE: int = Field(256, env="SNAPSHOT_CACHE_SIZE")
+    # Memory-mapped file sharing the models across workers (empty disables it)
+    MODEL_STORE_PATH: str = Field(
+        "/dev/shm/sermadrid/model_store.bin", env="MODEL_STORE_PATH"
+    )
+
+    # Number of champion models downloaded from MLflow concurrently
+    MODEL_LOAD_WORKERS: int = Field(8, env="MODEL_LOAD_WORKERS")
+
+    # Local copy of the champion models reused across restarts (empty disables it)
+    MODEL_SNAPSHOT_DIR: str = Field(
+        "/var/cache/sermadrid/models", env="MODEL_SNAPSHOT_DIR"
+    )
+
+    # Seconds between checks for new champion models (0 disables hot reload)
+    MODEL_RELOAD_INTERVAL_SECONDS: int = Field(300, env="MODEL_RELOAD_INTERVAL_SECONDS")
+
+    # Milliseconds concurrent single predictions are coalesced for (0 disables it)
+    MICRO_BATCH_WINDOW_MS: float = Field(0, env="MICRO_BATCH_WINDOW_MS")
+
+    # Where live inference runs: "thread" (request thread) or "process" (pool)
+    INFERENCE_EXECUTOR: str = Field("thread", env="INFERENCE_EXECUTOR")
+    # Worker processes of the inference pool (0 uses one per CPU)
+    INFERENCE_PROCESSES: int = Field(0, env="INFERENCE_PROCESSES")
+    # Predictions queued in the inference pool before rejecting new ones
+    INFERENCE_MAX_PENDING: int = Field(256, env="INFERENCE_MAX_PENDING")
+
+    # Seconds clients and proxies may reuse a prediction without revalidating it
+    HTTP_CACHE_MAX_AGE: int = Field(300, env="HTTP_CACHE_MAX_AGE")
+
+    # Number of (neighbourhood, hour) predictions kept in memory
+    PREDICTION_CACHE_SIZE: int = Field(100_000, env="PREDICTION_CACHE_SIZE")
+    # Seconds a cached prediction is served for (also cleared on model reloads)
+    PREDICTION_CACHE_TTL_SECONDS: int = Field(3600, env="PREDICTION_CACHE_TTL_SECONDS")
+
+    # Maximum number of hours of a forecast curve request
+    CURVE_MAX_HOURS: int = Field(24 * 31, env="CURVE_MAX_HOURS")
+    # Hours of a forecast curve computed and streamed at a time
+    CURVE_CHUNK_HOURS: int = Field(24, env="CURVE_CHUNK_HOURS")
+
+    # Maximum number of hours searched by a best time to park request
+    BEST_TIME_MAX_HOURS: int = Field(24 * 14, env="BEST_TIME_MAX_HOURS")
+
+    # Prediction requests handled at once (0 disables the admission control)
+    ADMISSION_MAX_CONCURRENCY: int = Field(0, env="ADMISSION_MAX_CONCURRENCY")
+    # Prediction requests waiting for a slot before shedding new ones
+    ADMISSION_MAX_QUEUED: int = Field(64, env="ADMISSION_MAX_QUEUED")
+    # Milliseconds a request may wait for a slot before being shed
+    ADMISSION_QUEUE_TIMEOUT_MS: int = Field(250, env="ADMISSION_QUEUE_TIMEOUT_MS")
+    # Seconds clients are asked to wait before retrying a shed request
+    ADMISSION_RETRY_AFTER_SECONDS: int = Field(1, env="ADMISSION_RETRY_AFTER_SECONDS")
+
+    # Directory of the neighbourhood and SER zone GeoJSON files
+    GEOJSON_DIR: str = Field("/code/assets", env="GEOJSON_DIR")
+    # Maximum distance in metres searched for nearby neighbourhoods
+    NEAREST_MAX_RADIUS_M: int = Field(5000, env="NEAREST_MAX_RADIUS_M")
 
 
 settings = Settings()
@@ -1,54 +1,318 @@
 import json
 import os
-from typing import Any, Dict, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 import mlflow
 from mlflow.tracking import MlflowClient
+from sermadrid.models import CompactProphetModelNH
 
-models: Dict[str, Any] = {}
-spaces_dict: Dict[str, Any] = {}
+from app.app.core.admission import AdmissionController
+from app.app.core.cache import LRUCache
+from app.app.core.config import settings
+from app.app.core.forecast_grid import ForecastGrid
+from app.app.core.geojson_tiles import GeoJSONTiles
+from app.app.core.inference_executor import InferenceExecutor
+from app.app.core.metrics import MODEL_LOAD_DURATION
+from app.app.core.micro_batcher import MicroBatcher
+from app.app.core.model_snapshot import ModelSnapshot
+from app.app.core.model_store import ModelStore, model_store_lock, write_model_store
+from app.app.core.spatial_index import SpatialIndex
+
+
+class ServingState(NamedTuple):
+    """Champion models, spaces data, champion versions and the forecast grid
+    computed from them, served together."""
+
+    models: Dict[str, Any]
+    spaces_dict: Dict[str, Any]
+    versions: Dict[str, str]
+    # Model store the models are mapped from, if any
+    store_path: Optional[str] = None
+    # Precomputed predictions of the models, if any
+    forecast_grid: Optional[ForecastGrid] = None
+    # MLflow run the spaces data comes from, which changes with its content
+    spaces_run_id: Optional[str] = None
+
+
+serving_state = ServingState(models={}, spaces_dict={}, versions={})
+model_snapshot: Optional[ModelSnapshot] = None
 data_loaded: bool = False
+snapshot_cache = LRUCache(maxsize=settings.SNAPSHOT_CACHE_SIZE, name="snapshot")
+prediction_cache = LRUCache(
+    maxsize=settings.PREDICTION_CACHE_SIZE,
+    ttl_seconds=settings.PREDICTION_CACHE_TTL_SECONDS,
+    name="prediction",
+)
+inference_executor = InferenceExecutor(
+    mode=settings.INFERENCE_EXECUTOR,
+    processes=settings.INFERENCE_PROCESSES or os.cpu_count() or 1,
+    max_pending=settings.INFERENCE_MAX_PENDING,
+)
+admission_controller = AdmissionController(
+    max_concurrency=settings.ADMISSION_MAX_CONCURRENCY,
+    max_queued=settings.ADMISSION_MAX_QUEUED,
+    queue_timeout_seconds=settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+)
+spatial_index: Optional[SpatialIndex] = None
+geojson_tiles: Optional[GeoJSONTiles] = None
+micro_batcher = (
+    MicroBatcher(
+        window_seconds=settings.MICRO_BATCH_WINDOW_MS / 1000,
+        inference_executor=inference_executor,
+    )
+    if settings.MICRO_BATCH_WINDOW_MS > 0
+    else None
+)
 
 
-def load_data() -> bool:
-    global models, spaces_dict, data_loaded
+def get_model_snapshot() -> Optional[ModelSnapshot]:
+    global model_snapshot
+    if model_snapshot is None and settings.MODEL_SNAPSHOT_DIR:
+        try:
+            model_snapshot = ModelSnapshot(settings.MODEL_SNAPSHOT_DIR)
+        except OSError as e:
+            print(f"Model snapshot not available, loading from MLflow only: {e}")
+    return model_snapshot
 
-    try:
-        # Set up MLflow client
-        mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
-        client = MlflowClient()
 
-        # Load models
-        for model_name in client.search_registered_models():
-            champion_version = client.get_model_version_by_alias(
-                model_name.name, "champion"
+def get_champion_versions(client: MlflowClient) -> Dict[str, str]:
+    """Return the champion version of every registered model.
+
+    The aliases come with the registered models, so this is a single registry
+    query (per page of 1000 models) instead of one query per model.
+    """
+    versions: Dict[str, str] = {}
+    page_token = None
+    while True:
+        page = client.search_registered_models(max_results=1000, page_token=page_token)
+        for registered_model in page:
+            if "champion" in registered_model.aliases:
+                versions[registered_model.name] = registered_model.aliases["champion"]
+        page_token = page.token
+        if not page_token:
+            return versions
+
+
+def load_champion_model(
+    model_name: str, version: str, snapshot: Optional[ModelSnapshot]
+) -> Tuple[Any, str]:
+    """Load a champion model from the local snapshot, or from MLflow if the
+    snapshot does not hold its version. Return the model and its source."""
+    if snapshot is not None:
+        model = snapshot.load_model(model_name, version)
+        if model is not None:
+            return model, "snapshot"
+
+    model = compact_model(
+        mlflow.pyfunc.load_model(
+            f"models:/{model_name}/{version}"
+        ).unwrap_python_model()
+    )
+    if snapshot is not None and isinstance(model, CompactProphetModelNH):
+        snapshot.save_model(model_name, version, model)
+    return model, "MLflow"
+
+
+def get_spaces_run_id(client: MlflowClient) -> str:
+    """Return the id of the run holding the production spaces data."""
+    experiment = client.get_experiment_by_name("model_promotion")
+    if experiment is None:
+        raise ValueError("model_promotion experiment not found")
+
+    spaces_runs = client.search_runs(
+        experiment_ids=[experiment.experiment_id],
+        filter_string="tags.spaces_clean_production = 'true'",
+        max_results=1,
+        order_by=["attribute.start_time DESC"],
+    )
+
+    if not spaces_runs:
+        raise ValueError("No spaces data found")
+
+    return spaces_runs[0].info.run_id
+
+
+def load_spaces(
+    client: MlflowClient, snapshot: Optional[ModelSnapshot]
+) -> Tuple[Dict[str, Any], str]:
+    spaces_run_id = get_spaces_run_id(client)
+    if snapshot is not None:
+        loaded_spaces_dict = snapshot.load_spaces(spaces_run_id)
+        if loaded_spaces_dict is not None:
+            return loaded_spaces_dict, spaces_run_id
+
+    spaces_artifact_path = client.download_artifacts(
+        spaces_run_id, "spaces_clean/spaces_clean.json"
+    )
+    with open(spaces_artifact_path, "r") as json_file:
+        loaded_spaces_dict = json.load(json_file)
+    if snapshot is not None:
+        snapshot.save_spaces(spaces_run_id, loaded_spaces_dict)
+    return loaded_spaces_dict, spaces_run_id
+
+
+def load_from_mlflow(
+    current: Optional[ServingState] = None,
+    on_spaces_loaded: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_model_loaded: Optional[Callable[[str, str, Any], None]] = None,
+) -> ServingState:
+    """Load the champion models and the production spaces data from MLflow.
+
+    Models already in `current` with the same champion version are reused and
+    models whose version is in the local snapshot are read from disk. The rest
+    are downloaded concurrently by a bounded pool of threads sharing a single
+    client, so its HTTP connections are reused. The callbacks are called as
+    soon as the spaces data and each model are available.
+    """
+    loaded_models: Dict[str, Any] = {}
+    snapshot = get_model_snapshot()
+
+    # Set up MLflow client
+    mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
+    client = MlflowClient()
+
+    # Load spaces data
+    loaded_spaces_dict, spaces_run_id = load_spaces(client, snapshot)
+    if on_spaces_loaded is not None:
+        on_spaces_loaded(loaded_spaces_dict)
+
+    # Load models
+    def timed_load(model_name: str, version: str) -> Tuple[Any, str, float]:
+        start = time.perf_counter()
+        model, source = load_champion_model(model_name, version, snapshot)
+        return model, source, time.perf_counter() - start
+
+    start = time.perf_counter()
+    versions = get_champion_versions(client)
+    if current is not None:
+        loaded_models = {
+            model_name: current.models[model_name]
+            for model_name, version in versions.items()
+            if model_name in current.models
+            and current.versions.get(model_name) == version
+        }
+    with ThreadPoolExecutor(
+        max_workers=settings.MODEL_LOAD_WORKERS, thread_name_prefix="model-loader"
+    ) as executor:
+        futures = {
+            executor.submit(timed_load, model_name, version): model_name
+            for model_name, version in versions.items()
+            if model_name not in loaded_models
+        }
+        for future in as_completed(futures):
+            model_name = futures[future]
+            model, source, duration = future.result()
+            MODEL_LOAD_DURATION.labels(source=source).observe(duration)
+            print(
+                f"Loaded model {model_name} v{versions[model_name]} from {source} "
+                f"in {duration:.2f}s"
             )
-            if champion_version:
-                models[model_name.name] = mlflow.pyfunc.load_model(
-                    f"models:/{model_name.name}@champion"
-                ).unwrap_python_model()
-
-        # Load spaces data
-        experiment = client.get_experiment_by_name("model_promotion")
-        if experiment is None:
-            raise ValueError("model_promotion experiment not found")
-
-        spaces_runs = client.search_runs(
-            experiment_ids=[experiment.experiment_id],
-            filter_string="tags.spaces_clean_production = 'true'",
-            max_results=1,
-            order_by=["attribute.start_time DESC"],
+            loaded_models[model_name] = model
+            if on_model_loaded is not None:
+                on_model_loaded(model_name, versions[model_name], model)
+    print(f"Loaded {len(futures)} models in {time.perf_counter() - start:.2f}s")
+
+    if snapshot is not None:
+        snapshot.prune(versions, spaces_run_id)
+
+    # Keep the registry order, whatever order the models finished loading in
+    loaded_models = {model_name: loaded_models[model_name] for model_name in versions}
+    return ServingState(
+        loaded_models, loaded_spaces_dict, versions, spaces_run_id=spaces_run_id
+    )
+
+
+def is_up_to_date(state: ServingState, client: MlflowClient) -> bool:
+    """Whether `state` holds the current champion versions and production
+    spaces data, checked with two registry queries and no downloads."""
+    if state.versions != get_champion_versions(client):
+        return False
+    return state.spaces_run_id == get_spaces_run_id(client)
+
+
+def attach_model_store(path: str) -> ServingState:
+    store = ModelStore(path)
+    print(f"Attached to model store {path} with {len(store.models)} models")
+    return ServingState(
+        store.models,
+        store.spaces_dict,
+        store.metadata.get("versions", {}),
+        store_path=path,
+        spaces_run_id=store.metadata.get("spaces_run_id"),
+    )
+
+
+def load_from_model_store(
+    path: str,
+    current: Optional[ServingState] = None,
+    on_spaces_loaded: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_model_loaded: Optional[Callable[[str, str, Any], None]] = None,
+) -> ServingState:
+    """Attach to the model store shared by all the workers.
+
+    The first worker to take the store lock loads the models from MLflow and
+    writes the store, the others wait for it and attach to the same file. An
+    existing store is only attached if it holds the current champion versions
+    and spaces data, e.g. once another worker updated it. Otherwise, whether
+    the worker is starting or reloading, the store is rewritten reusing its
+    unchanged models, or the `current` ones if there is no store yet. Workers
+    attached to the previous store keep their mapping until they attach to the
+    new one.
+    """
+    with model_store_lock(path):
+        stored = attach_model_store(path) if os.path.exists(path) else None
+        if stored is not None:
+            mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
+            if is_up_to_date(stored, MlflowClient()):
+                return stored
+            print(f"Model store {path} holds outdated champion models or spaces")
+
+        state = load_from_mlflow(stored or current, on_spaces_loaded, on_model_loaded)
+        if not all(
+            isinstance(model, CompactProphetModelNH) for model in state.models.values()
+        ):
+            print("Not all models are compact, skipping the shared model store")
+            return state
+        write_model_store(
+            path,
+            state.models,
+            state.spaces_dict,
+            {"versions": state.versions, "spaces_run_id": state.spaces_run_id},
         )
+        print(f"Model store written to {path}")
+
+    return attach_model_store(path)
+
+
+def load_serving_state(
+    current: Optional[ServingState] = None,
+    on_spaces_loaded: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_model_loaded: Optional[Callable[[str, str, Any], None]] = None,
+) -> ServingState:
+    if settings.MODEL_STORE_PATH:
+        try:
+            return load_from_model_store(
+                settings.MODEL_STORE_PATH, current, on_spaces_loaded, on_model_loaded
+            )
+        except OSError as e:
+            print(f"Model store not available, loading models in process: {e}")
+    return load_from_mlflow(current, on_spaces_loaded, on_model_loaded)
+
 
-        if not spaces_runs:
-            raise ValueError("No spaces data found")
+def load_data() -> bool:
+    global serving_state, data_loaded
 
-        spaces_run = spaces_runs[0]
-        spaces_artifact_path = client.download_artifacts(
-            spaces_run.info.run_id, "spaces_clean/spaces_clean.json"
+    try:
+        state = load_serving_state(
+            on_spaces_loaded=publish_spaces, on_model_loaded=publish_model
         )
-        with open(spaces_artifact_path, "r") as json_file:
-            spaces_dict = json.load(json_file)
+
+        inference_executor.update(state.models, state.store_path)
+        serving_state = state._replace(forecast_grid=build_forecast_grid(state))
+        snapshot_cache.clear()
+        prediction_cache.clear()
 
         data_loaded = True
         return True
@@ -57,8 +321,159 @@ def load_data() -> bool:
         return False
 
 
-def get_models_and_spaces() -> Tuple[Dict[str, Any], Dict[str, Any]]:
-    return models, spaces_dict
+def reload_data() -> bool:
+    """Load the champion models promoted since the last load and swap them in.
+
+    The champion versions and the production spaces run are checked with two
+    registry queries and only the models whose version changed are loaded,
+    and only their rows of the forecast grid are recomputed, on a copy. The
+    new models, spaces data and grid are published together in a single
+    assignment, so requests in flight keep using the previous ones and no
+    response mixes both. Return whether the served models or spaces changed.
+    """
+    global serving_state
+
+    current = serving_state
+    try:
+        mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI"))
+        if is_up_to_date(current, MlflowClient()):
+            return False
+
+        state = load_serving_state(current)
+        changed = [
+            model_name
+            for model_name, version in state.versions.items()
+            if current.versions.get(model_name) != version
+        ]
+        if state.spaces_dict != current.spaces_dict:
+            grid = build_forecast_grid(state)
+        else:
+            grid = refresh_forecast_grid(current, state, changed)
+
+        inference_executor.update(state.models, state.store_path)
+        serving_state = state._replace(forecast_grid=grid)
+        snapshot_cache.clear()
+        prediction_cache.clear()
+
+        print(f"Reloaded champion models: {changed}")
+        return True
+    except Exception as e:
+        print(f"Failed to reload data: {e}")
+        return False
+
+
+def publish_spaces(loaded_spaces_dict: Dict[str, Any]) -> None:
+    global serving_state
+    serving_state = serving_state._replace(spaces_dict=loaded_spaces_dict)
+
+
+def publish_model(model_name: str, version: str, model: Any) -> None:
+    # Neighbourhoods become servable as soon as their model is loaded, along
+    # with its version for the ETags. The dicts are replaced rather than
+    # mutated so readers never see them changing
+    global serving_state
+    serving_state = serving_state._replace(
+        models={**serving_state.models, model_name: model},
+        versions={**serving_state.versions, model_name: version},
+    )
+
+
+def compact_model(model: Any) -> Any:
+    # Keep only the fitted parameters needed for inference in memory, unless
+    # the model uses features not supported by the compact representation
+    try:
+        return model.to_compact()
+    except (AttributeError, ValueError) as e:
+        print(f"Keeping full model {model}: {e}")
+        return model
+
+
+def build_forecast_grid(state: ServingState) -> Optional[ForecastGrid]:
+    grid = ForecastGrid(horizon_hours=settings.FORECAST_GRID_HORIZON_HOURS)
+    try:
+        grid.build(state.models, state.spaces_dict)
+        return grid
+    except Exception as e:
+        print(f"Failed to build forecast grid, serving live inference only: {e}")
+        return None
+
+
+def refresh_forecast_grid(
+    current: ServingState, state: ServingState, neighbourhood_ids: List[str]
+) -> Optional[ForecastGrid]:
+    # Refreshed on a copy, the current grid keeps serving the current models
+    if current.forecast_grid is None:
+        return build_forecast_grid(state)
+    grid = current.forecast_grid.copy()
+    try:
+        grid.refresh(state.models, state.spaces_dict, neighbourhood_ids)
+        return grid
+    except Exception as e:
+        print(f"Failed to refresh forecast grid, serving live inference only: {e}")
+        return None
+
+
+def roll_forecast_grid() -> None:
+    state = serving_state
+    if state.forecast_grid is None:
+        return
+    try:
+        state.forecast_grid.roll(state.models, state.spaces_dict)
+    except Exception as e:
+        print(f"Failed to roll forecast grid: {e}")
+
+
+def load_spatial_index() -> None:
+    global spatial_index
+    path = os.path.join(settings.GEOJSON_DIR, "neighbourhood_limits.geojson")
+    try:
+        spatial_index = SpatialIndex.from_geojson(path)
+        print(
+            f"Spatial index built with {len(spatial_index.neighbourhoods)} neighbourhoods"
+        )
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Spatial index not available: {e}")
+
+
+def load_geojson_tiles() -> None:
+    global geojson_tiles
+    try:
+        geojson_tiles = GeoJSONTiles.build(settings.GEOJSON_DIR)
+        print("GeoJSON tiles built")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"GeoJSON tiles not available: {e}")
+
+
+def get_serving_state() -> ServingState:
+    return serving_state
+
+
+def get_snapshot_cache() -> LRUCache:
+    return snapshot_cache
+
+
+def get_prediction_cache() -> LRUCache:
+    return prediction_cache
+
+
+def get_inference_executor() -> InferenceExecutor:
+    return inference_executor
+
+
+def get_micro_batcher() -> Optional[MicroBatcher]:
+    return micro_batcher
+
+
+def get_admission_controller() -> AdmissionController:
+    return admission_controller
+
+
+def get_spatial_index() -> Optional[SpatialIndex]:
+    return spatial_index
+
+
+def get_geojson_tiles() -> Optional[GeoJSONTiles]:
+    return geojson_tiles
 
 
 def is_data_loaded() -> bool:
@@ -0,0 +1,232 @@
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from sermadrid.pipelines import SerMadridInferencePipeline
+
+logger = logging.getLogger(__name__)
+
+MADRID_TZ = "Europe/Madrid"
+HOUR_NS = 3600 * 10**9
+
+
+def current_hour() -> pd.Timestamp:
+    """Return the current Madrid local time floored to the hour (tz-naive)."""
+    return pd.Timestamp.now(tz=MADRID_TZ).tz_localize(None).floor("h")
+
+
+def to_local_time(timestamp: pd.Timestamp) -> pd.Timestamp:
+    """Convert a tz-aware timestamp to the naive Madrid local time of the models."""
+    if timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.tz_convert(MADRID_TZ).tz_localize(None)
+
+
+class _GridState(NamedTuple):
+    start: pd.Timestamp
+    start_ns: int
+    rows: Dict[str, int]
+    values: np.ndarray
+
+
+class ForecastGrid:
+    """Dense (neighbourhood x hour) grid of precomputed parking availability.
+
+    The grid covers `horizon_hours` hourly timestamps starting at the current
+    hour, so requests falling inside it are answered with an array lookup
+    instead of a model inference. The models are trained on hourly aggregates,
+    hence lookups are floored to the hour. Lookups outside the grid return
+    None and callers are expected to fall back to live inference.
+    """
+
+    def __init__(self, horizon_hours: int) -> None:
+        self.horizon_hours = horizon_hours
+        self._state: Optional[_GridState] = None
+        self._lock = threading.RLock()
+
+    @property
+    def start(self) -> Optional[pd.Timestamp]:
+        state = self._state
+        return None if state is None else state.start
+
+    @staticmethod
+    def _compute(
+        models: dict,
+        spaces_dict: dict,
+        neighbourhood_ids: List[str],
+        dates: pd.DatetimeIndex,
+    ) -> np.ndarray:
+        pipeline = SerMadridInferencePipeline()
+        values = np.empty((len(neighbourhood_ids), len(dates)))
+        for row, neighbourhood_id in enumerate(neighbourhood_ids):
+            values[row] = pipeline.run(
+                datetime=dates,
+                model=models[neighbourhood_id],
+                num_plazas=spaces_dict[neighbourhood_id]["num_plazas"],
+                return_percentage=True,
+            )
+        return values
+
+    def build(
+        self,
+        models: dict,
+        spaces_dict: dict,
+        start: Optional[pd.Timestamp] = None,
+    ) -> None:
+        """Compute the whole grid from `start` (default: the current hour)."""
+        if self.horizon_hours <= 0:
+            return
+        start = current_hour() if start is None else start.floor("h")
+        neighbourhood_ids = [
+            neighbourhood_id
+            for neighbourhood_id in models
+            if neighbourhood_id in spaces_dict
+        ]
+        dates = pd.date_range(start, periods=self.horizon_hours, freq="h")
+
+        with self._lock:
+            values = self._compute(models, spaces_dict, neighbourhood_ids, dates)
+            self._state = _GridState(
+                start=start,
+                start_ns=start.value,
+                rows={nid: row for row, nid in enumerate(neighbourhood_ids)},
+                values=values,
+            )
+        logger.info(
+            f"Forecast grid built for {len(neighbourhood_ids)} neighbourhoods "
+            f"and {self.horizon_hours} hours from {start}"
+        )
+
+    def roll(
+        self,
+        models: dict,
+        spaces_dict: dict,
+        now: Optional[pd.Timestamp] = None,
+    ) -> None:
+        """Move the grid forward to the hour of `now` (default: current hour).
+
+        Only the hours entering the horizon are computed; the rest of the grid
+        is shifted. The grid is rebuilt from scratch if the set of models
+        changed or the grid fell behind by more than its horizon.
+        """
+        if self.horizon_hours <= 0:
+            return
+        start = current_hour() if now is None else now.floor("h")
+        neighbourhood_ids = [
+            neighbourhood_id
+            for neighbourhood_id in models
+            if neighbourhood_id in spaces_dict
+        ]
+        with self._lock:
+            state = self._state
+            if state is None or list(state.rows) != neighbourhood_ids:
+                self.build(models, spaces_dict, start=start)
+                return
+
+            shift = (start.value - state.start_ns) // HOUR_NS
+            if shift <= 0:
+                return
+            if shift >= self.horizon_hours:
+                self.build(models, spaces_dict, start=start)
+                return
+
+            new_dates = pd.date_range(
+                state.start + pd.Timedelta(hours=self.horizon_hours),
+                periods=shift,
+                freq="h",
+            )
+            new_values = self._compute(
+                models, spaces_dict, neighbourhood_ids, new_dates
+            )
+            self._state = _GridState(
+                start=start,
+                start_ns=start.value,
+                rows=state.rows,
+                values=np.concatenate([state.values[:, shift:], new_values], axis=1),
+            )
+        logger.info(f"Forecast grid rolled forward {shift} hours to {start}")
+
+    def refresh(
+        self,
+        models: dict,
+        spaces_dict: dict,
+        neighbourhood_ids: List[str],
+    ) -> None:
+        """Recompute the rows of `neighbourhood_ids`, e.g. after their models
+        changed, keeping the rest of the grid. The grid is rebuilt from scratch
+        if the set of models changed."""
+        if self.horizon_hours <= 0:
+            return
+        all_ids = [
+            neighbourhood_id
+            for neighbourhood_id in models
+            if neighbourhood_id in spaces_dict
+        ]
+        with self._lock:
+            state = self._state
+            if state is None or set(state.rows) != set(all_ids):
+                self.build(models, spaces_dict)
+                return
+
+            refreshed = [nid for nid in neighbourhood_ids if nid in state.rows]
+            if not refreshed:
+                return
+            dates = pd.date_range(state.start, periods=state.values.shape[1], freq="h")
+            values = state.values.copy()
+            values[[state.rows[nid] for nid in refreshed]] = self._compute(
+                models, spaces_dict, refreshed, dates
+            )
+            self._state = state._replace(values=values)
+        logger.info(f"Forecast grid refreshed for {len(refreshed)} neighbourhoods")
+
+    def lookup(self, neighbourhood_id: str, timestamp: pd.Timestamp) -> Optional[float]:
+        """Return the precomputed availability, or None if outside the grid."""
+        state = self._state
+        if state is None or timestamp.tzinfo is not None:
+            return None
+        row = state.rows.get(neighbourhood_id)
+        if row is None:
+            return None
+        column = (timestamp.value - state.start_ns) // HOUR_NS
+        if not 0 <= column < state.values.shape[1]:
+            return None
+        return float(state.values[row, column])
+
+    def lookup_many(
+        self, neighbourhood_id: str, timestamps: pd.DatetimeIndex
+    ) -> np.ndarray:
+        """Vectorized `lookup`, with NaN for the timestamps outside the grid."""
+        predictions = np.full(len(timestamps), np.nan)
+        state = self._state
+        if state is None or timestamps.tz is not None:
+            return predictions
+        row = state.rows.get(neighbourhood_id)
+        if row is None:
+            return predictions
+        columns = (timestamps.asi8 - state.start_ns) // HOUR_NS
+        in_grid = (columns >= 0) & (columns < state.values.shape[1])
+        predictions[in_grid] = state.values[row, columns[in_grid]]
+        return predictions
+
+    def column(self, timestamp: pd.Timestamp) -> Optional[Dict[str, float]]:
+        """Return the availability of every neighbourhood at the hour of
+        `timestamp`, or None if outside the grid."""
+        state = self._state
+        if state is None or timestamp.tzinfo is not None:
+            return None
+        column = (timestamp.value - state.start_ns) // HOUR_NS
+        if not 0 <= column < state.values.shape[1]:
+            return None
+        return dict(zip(state.rows, state.values[:, column].tolist()))
+
+    def copy(self) -> "ForecastGrid":
+        """Return a grid with the same values, that can be refreshed without
+        changing this one."""
+        grid = ForecastGrid(horizon_hours=self.horizon_hours)
+        grid._state = self._state
+        return grid
+
+    def clear(self) -> None:
+        self._state = None
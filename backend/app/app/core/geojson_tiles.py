@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LAYERS = ("neighbourhood_limits", "ser_zone_limit")
+
+# Minimum map zoom of every level, with its simplification tolerance and the
+# decimals the coordinates are rounded to, both in degrees (1e-4 is ~10 m)
+ZOOM_LEVELS: Dict[int, Tuple[float, int]] = {
+    0: (5e-4, 4),
+    12: (1e-4, 5),
+    14: (2e-5, 5),
+    16: (0.0, 6),
+}
+
+
+class EncodedGeoJSON(NamedTuple):
+    """A GeoJSON document serialized and compressed once, ready to send."""
+
+    # Body of every available content encoding, "identity" included
+    bodies: Dict[str, bytes]
+    # Strong ETag of every body, distinct per encoding as the bytes differ
+    etags: Dict[str, str]
+
+
+def _perpendicular_distances(points: np.ndarray, start: int, end: int) -> np.ndarray:
+    first, last = points[start], points[end]
+    direction = last - first
+    offsets = points[start + 1 : end] - first
+    length = np.hypot(*direction)
+    if length == 0:
+        return np.hypot(offsets[:, 0], offsets[:, 1])
+    return np.abs(direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]) / length
+
+
+def simplify_ring(ring: np.ndarray, tolerance: float) -> np.ndarray:
+    """Douglas-Peucker simplification of a closed ring, keeping its endpoints."""
+    if tolerance <= 0 or len(ring) <= 4:
+        return ring
+    keep = np.zeros(len(ring), dtype=bool)
+    keep[0] = keep[-1] = True
+    # Iterative, as rings have thousands of points
+    stack = [(0, len(ring) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        distances = _perpendicular_distances(ring, start, end)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return ring[keep]
+
+
+def quantise_ring(ring: np.ndarray, decimals: int) -> np.ndarray:
+    """Round the coordinates and drop the consecutive duplicates it creates."""
+    ring = np.round(ring, decimals)
+    distinct = np.ones(len(ring), dtype=bool)
+    distinct[1:] = np.any(ring[1:] != ring[:-1], axis=1)
+    return ring[distinct]
+
+
+def _simplify_polygons(
+    polygons: List[List[List[List[float]]]], tolerance: float, decimals: int
+) -> List[List[List[List[float]]]]:
+    simplified = []
+    for polygon in polygons:
+        rings = []
+        for ring_index, ring in enumerate(polygon):
+            points = quantise_ring(
+                simplify_ring(np.asarray(ring, dtype=np.float64)[:, :2], tolerance),
+                decimals,
+            )
+            if len(points) >= 4:
+                rings.append(points.tolist())
+            elif ring_index == 0:
+                # Polygons smaller than the tolerance are not visible
+                break
+        else:
+            simplified.append(rings)
+    if not simplified and polygons:
+        # Never drop a whole feature, keep its largest polygon unsimplified
+        largest = max(polygons, key=lambda polygon: len(polygon[0]))
+        simplified.append(
+            [
+                quantise_ring(np.asarray(ring)[:, :2], decimals).tolist()
+                for ring in largest
+            ]
+        )
+    return simplified
+
+
+def simplify_geojson(geojson: dict, tolerance: float, decimals: int) -> dict:
+    """Return a copy of a feature collection of (multi)polygons simplified
+    with `tolerance` and coordinates rounded to `decimals`."""
+    features = []
+    for feature in geojson["features"]:
+        geometry = feature["geometry"]
+        if geometry["type"] == "Polygon":
+            polygons = _simplify_polygons(
+                [geometry["coordinates"]], tolerance, decimals
+            )
+            coordinates = polygons[0]
+        else:
+            coordinates = _simplify_polygons(
+                geometry["coordinates"], tolerance, decimals
+            )
+        features.append(
+            {
+                "type": "Feature",
+                "properties": feature["properties"],
+                "geometry": {"type": geometry["type"], "coordinates": coordinates},
+            }
+        )
+    return {"type": "FeatureCollection", "features": features}
+
+
+def encode_geojson(geojson: dict) -> EncodedGeoJSON:
+    body = json.dumps(geojson, separators=(",", ":"), ensure_ascii=False).encode(
+        "utf-8"
+    )
+    bodies = {
+        "identity": body,
+        # No timestamp in the header, so the output only depends on the body
+        "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+    }
+    digest = hashlib.sha1(body).hexdigest()
+    etags = {
+        encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+        for encoding in bodies
+    }
+    return EncodedGeoJSON(bodies=bodies, etags=etags)
+
+
+def zoom_level(zoom: float) -> int:
+    """Return the level of `zoom`, the highest one not above it."""
+    return max(
+        (level for level in ZOOM_LEVELS if level <= zoom), default=min(ZOOM_LEVELS)
+    )
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: List[str]) -> str:
+    """Pick the compressed encoding of the `available` ones an Accept-Encoding
+    header prefers by quality value, or identity if it accepts none of them."""
+    if not accept_encoding:
+        return "identity"
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    candidates = [
+        (accepted.get(encoding, accepted.get("*", 0.0)), encoding)
+        for encoding in available
+        if encoding != "identity"
+    ]
+    best = max(
+        (candidate for candidate in candidates if candidate[0] > 0),
+        key=lambda candidate: candidate[0],
+        default=None,
+    )
+    return "identity" if best is None else best[1]
+
+
+class GeoJSONTiles:
+    """Map boundaries at every zoom level, built once and kept compressed."""
+
+    def __init__(self, documents: Dict[Tuple[str, int], EncodedGeoJSON]) -> None:
+        self._documents = documents
+
+    @classmethod
+    def build(cls, geojson_dir: str) -> "GeoJSONTiles":
+        documents = {}
+        for layer in LAYERS:
+            with open(os.path.join(geojson_dir, f"{layer}.geojson"), "r") as file:
+                geojson = json.load(file)
+            for level, (tolerance, decimals) in ZOOM_LEVELS.items():
+                documents[(layer, level)] = encode_geojson(
+                    simplify_geojson(geojson, tolerance, decimals)
+                )
+                logger.info(
+                    f"GeoJSON {layer} at zoom {level}: "
+                    + ", ".join(
+                        f"{encoding} {len(body)} bytes"
+                        for encoding, body in documents[(layer, level)].bodies.items()
+                    )
+                )
+        return cls(documents)
+
+    def get(self, layer: str, zoom: float) -> Optional[EncodedGeoJSON]:
+        return self._documents.get((layer, zoom_level(zoom)))
@@ -0,0 +1,48 @@
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from app.app.core.config import settings
+
+# Fingerprint of the last spaces data seen, kept along with the dict itself so
+# its id can not be reused by another object
+_spaces_fingerprint: Optional[Tuple[Dict[str, Any], str]] = None
+_spaces_fingerprint_lock = threading.Lock()
+
+
+def spaces_fingerprint(spaces_dict: Dict[str, Any]) -> str:
+    """Return a digest of the spaces data, computed once per loaded dict."""
+    global _spaces_fingerprint
+    cached = _spaces_fingerprint
+    if cached is not None and cached[0] is spaces_dict:
+        return cached[1]
+    digest = hashlib.sha1(
+        json.dumps(spaces_dict, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    with _spaces_fingerprint_lock:
+        _spaces_fingerprint = (spaces_dict, digest)
+    return digest
+
+
+def make_etag(*parts: str) -> str:
+    """Build a strong ETag from the values a response depends on."""
+    return '"' + hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Return whether an If-None-Match header matches `etag`."""
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    # Weak comparison, as required for If-None-Match
+    return "*" in candidates or etag in {
+        tag[2:] if tag.startswith("W/") else tag for tag in candidates
+    }
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.HTTP_CACHE_MAX_AGE}",
+    }
@@ -0,0 +1,223 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sermadrid.pipelines import SerMadridInferencePipeline
+
+from app.app.core.metrics import INFERENCE_QUEUE_DEPTH, INFERENCE_REJECTED
+from app.app.core.model_store import ModelStore
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_MODES = ("thread", "process")
+
+# Models held by each process pool worker
+_worker_models: Dict[str, Any] = {}
+
+
+class InferenceQueueFullError(Exception):
+    """Raised when the inference executor has too many pending predictions."""
+
+
+def _init_worker(store_path: Optional[str], models: Optional[Dict[str, Any]]) -> None:
+    global _worker_models
+    if store_path is not None:
+        # Attach to the same read-only memory map as the serving processes
+        _worker_models = ModelStore(store_path).models
+    else:
+        _worker_models = models or {}
+
+
+def _predict_in_worker(
+    neighbourhood_id: str,
+    datetime: pd.Timestamp | pd.DatetimeIndex | str,
+    num_plazas: int,
+) -> List[float]:
+    return list(
+        SerMadridInferencePipeline().run(
+            datetime=datetime,
+            model=_worker_models.get(neighbourhood_id),
+            num_plazas=num_plazas,
+            return_percentage=True,
+        )
+    )
+
+
+def _predict_many_in_worker(
+    neighbourhood_ids: List[str],
+    datetime: pd.Timestamp | pd.DatetimeIndex | str,
+    num_plazas: List[int],
+) -> np.ndarray:
+    return SerMadridInferencePipeline().run_many(
+        datetime=datetime,
+        models=[_worker_models.get(nid) for nid in neighbourhood_ids],
+        num_plazas=num_plazas,
+        return_percentage=True,
+    )
+
+
+class InferenceExecutor:
+    """Run the model inference in the calling thread or in a process pool.
+
+    In "thread" mode predictions run in the request thread, as they always
+    did. In "process" mode they are sent to a pool of worker processes holding
+    their own copy of the models (or attached to the shared model store), so
+    inference scales across cores instead of competing for the GIL. At most
+    `max_pending` predictions are queued or running at once; further ones are
+    rejected with `InferenceQueueFullError` so callers can shed load.
+    """
+
+    def __init__(self, mode: str, processes: int, max_pending: int) -> None:
+        if mode not in INFERENCE_MODES:
+            raise ValueError(
+                f"Unknown inference executor {mode}, expected one of {INFERENCE_MODES}"
+            )
+        self.mode = mode
+        self.processes = processes
+        self.max_pending = max_pending
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of predictions queued or running in the process pool."""
+        return self._pending
+
+    def update(self, models: Dict[str, Any], store_path: Optional[str] = None) -> None:
+        """Start a process pool holding `models`, replacing the previous one.
+
+        Workers attach to the model store at `store_path` if given, otherwise
+        they receive a copy of `models`. Predictions already submitted to the
+        previous pool still complete.
+        """
+        if self.mode != "process":
+            return
+        pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            # Spawned, as forking a process running threads is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(store_path, None if store_path is not None else models),
+        )
+        previous, self._pool = self._pool, pool
+        if previous is not None:
+            previous.shutdown(wait=False)
+        logger.info(
+            f"Inference process pool started with {self.processes} workers "
+            f"and {len(models)} models"
+        )
+
+    def _release(self, _future: Any = None) -> None:
+        with self._lock:
+            self._pending -= 1
+            INFERENCE_QUEUE_DEPTH.set(self._pending)
+
+    def _submit(
+        self, predict: Callable[[], Any], predict_in_worker: Callable, *args: Any
+    ) -> Future:
+        """Run `predict` right away in "thread" mode, or `predict_in_worker`
+        with `args` in the process pool, counting it as one pending
+        prediction."""
+        pool = self._pool
+        if pool is None:
+            future: Future = Future()
+            try:
+                future.set_result(predict())
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                INFERENCE_REJECTED.inc()
+                raise InferenceQueueFullError(
+                    f"{self._pending} predictions already pending"
+                )
+            self._pending += 1
+            INFERENCE_QUEUE_DEPTH.set(self._pending)
+        try:
+            future = pool.submit(predict_in_worker, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def submit(
+        self,
+        neighbourhood_id: str,
+        datetime: pd.Timestamp | pd.DatetimeIndex | str,
+        models: dict,
+        spaces_dict: dict,
+    ) -> Future:
+        """Start predicting the parking availability of `neighbourhood_id` and
+        return the future of its predictions. In "thread" mode the prediction
+        runs right away and the future is already done."""
+        num_plazas = spaces_dict[neighbourhood_id]["num_plazas"]
+        return self._submit(
+            lambda: SerMadridInferencePipeline().run(
+                datetime=datetime,
+                model=models.get(neighbourhood_id),
+                num_plazas=num_plazas,
+                return_percentage=True,
+            ),
+            _predict_in_worker,
+            neighbourhood_id,
+            datetime,
+            num_plazas,
+        )
+
+    def submit_many(
+        self,
+        neighbourhood_ids: List[str],
+        datetime: pd.Timestamp | pd.DatetimeIndex | str,
+        models: dict,
+        spaces_dict: dict,
+    ) -> Future:
+        """Like `submit`, for several neighbourhoods predicted in a single
+        pass, with one row of predictions per neighbourhood."""
+        num_plazas = [spaces_dict[nid]["num_plazas"] for nid in neighbourhood_ids]
+        return self._submit(
+            lambda: SerMadridInferencePipeline().run_many(
+                datetime=datetime,
+                models=[models.get(nid) for nid in neighbourhood_ids],
+                num_plazas=num_plazas,
+                return_percentage=True,
+            ),
+            _predict_many_in_worker,
+            neighbourhood_ids,
+            datetime,
+            num_plazas,
+        )
+
+    def run(
+        self,
+        neighbourhood_id: str,
+        datetime: pd.Timestamp | pd.DatetimeIndex | str,
+        models: dict,
+        spaces_dict: dict,
+    ) -> List[float]:
+        """Return the parking availability predictions of `neighbourhood_id`."""
+        return self.submit(neighbourhood_id, datetime, models, spaces_dict).result()
+
+    def run_many(
+        self,
+        neighbourhood_ids: List[str],
+        datetime: pd.Timestamp | pd.DatetimeIndex | str,
+        models: dict,
+        spaces_dict: dict,
+    ) -> np.ndarray:
+        """Return the predictions of `neighbourhood_ids`, one row each."""
+        return self.submit_many(
+            neighbourhood_ids, datetime, models, spaces_dict
+        ).result()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,117 @@
+import threading
+from typing import Dict, List
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Finer than the prometheus_client defaults, grid lookups take microseconds
+LATENCY_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# Metrics are kept per process in the default registry, which also reports
+# the process memory and CPU, so with several workers each scrape reports the
+# metrics of the worker answering it
+STAGE_DURATION = Histogram(
+    "sermadrid_stage_duration_seconds",
+    "Time spent in each stage of the prediction requests.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DURATION = Histogram(
+    "sermadrid_request_duration_seconds",
+    "End to end time of the HTTP requests, including serialisation.",
+    ["route", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+PREDICTIONS = Counter(
+    "sermadrid_predictions",
+    "Predictions served per neighbourhood.",
+    ["neighbourhood_id"],
+)
+CACHE_REQUESTS = Counter(
+    "sermadrid_cache_requests",
+    "Cache lookups per cache and result (hit or miss).",
+    ["cache", "result"],
+)
+CACHE_EVICTIONS = Counter(
+    "sermadrid_cache_evictions",
+    "Cache entries evicted per cache and reason (size or ttl).",
+    ["cache", "reason"],
+)
+CACHE_HIT_RATIO = Gauge(
+    "sermadrid_cache_hit_ratio",
+    "Ratio of cache lookups answered from the cache.",
+    ["cache"],
+)
+MODEL_LOAD_DURATION = Histogram(
+    "sermadrid_model_load_duration_seconds",
+    "Time to load a champion model, per source (MLflow or snapshot).",
+    ["source"],
+    buckets=LATENCY_BUCKETS,
+)
+MICRO_BATCH_SIZE = Histogram(
+    "sermadrid_micro_batch_size",
+    "Number of single predictions coalesced in each micro-batch.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "sermadrid_inference_queue_depth",
+    "Predictions queued or running in the inference process pool.",
+)
+INFERENCE_REJECTED = Counter(
+    "sermadrid_inference_rejected",
+    "Predictions rejected because the inference queue was full.",
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "sermadrid_admission_in_flight",
+    "Prediction requests admitted and being handled.",
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "sermadrid_admission_queue_wait_seconds",
+    "Time admitted prediction requests waited for a slot.",
+    buckets=LATENCY_BUCKETS,
+)
+ADMISSION_REJECTED = Counter(
+    "sermadrid_admission_rejected",
+    "Prediction requests shed per reason (queue_full, queue_budget or "
+    "queue_timeout).",
+    ["reason"],
+)
+
+# Hits and misses of every cache, to keep its hit ratio up to date
+_cache_lookups: Dict[str, List[int]] = {}
+_cache_lookups_lock = threading.Lock()
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_DURATION.labels(stage=stage).observe(seconds)
+
+
+def record_cache_lookups(cache: str, hits: int, misses: int) -> None:
+    if hits:
+        CACHE_REQUESTS.labels(cache=cache, result="hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache=cache, result="miss").inc(misses)
+    with _cache_lookups_lock:
+        lookups = _cache_lookups.setdefault(cache, [0, 0])
+        lookups[0] += hits
+        lookups[1] += misses
+        total = lookups[0] + lookups[1]
+        if total:
+            CACHE_HIT_RATIO.labels(cache=cache).set(lookups[0] / total)
@@ -0,0 +1,156 @@
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.app.core.inference_executor import InferenceExecutor, InferenceQueueFullError
+from app.app.core.metrics import MICRO_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingPrediction(NamedTuple):
+    neighbourhood_id: str
+    timestamp: pd.Timestamp
+    models: dict
+    spaces_dict: dict
+    future: Future
+
+
+class MicroBatcher:
+    """Coalesce concurrent single predictions into one inference per model.
+
+    Requests arriving within `window_seconds` of the first one in a batch are
+    grouped by neighbourhood, and each group is predicted with a single
+    vectorized inference call instead of one call per request. The calls go
+    through `inference_executor`, so in "process" mode the groups of a batch
+    run in parallel in its pool and count towards its pending limit. Callers
+    block until their own prediction is ready, so a request waits at most the
+    window on top of its inference time.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        inference_executor: InferenceExecutor,
+        max_batch_size: int = 1024,
+    ) -> None:
+        self.window_seconds = window_seconds
+        self.inference_executor = inference_executor
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[_PendingPrediction]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="micro-batcher", daemon=True
+                    )
+                    self._thread.start()
+
+    def predict(
+        self,
+        neighbourhood_id: str,
+        timestamp: pd.Timestamp,
+        models: dict,
+        spaces_dict: dict,
+    ) -> float:
+        """Return the parking availability of `neighbourhood_id` at `timestamp`,
+        predicted together with the other requests of the same batch."""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put(
+            _PendingPrediction(neighbourhood_id, timestamp, models, spaces_dict, future)
+        )
+        return future.result()
+
+    def _collect(self) -> List[_PendingPrediction]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            MICRO_BATCH_SIZE.observe(len(batch))
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.exception(f"Micro-batch of {len(batch)} predictions failed")
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+
+    def _process(self, batch: List[_PendingPrediction]) -> None:
+        # Requests are grouped by the model and spaces objects too, so a hot
+        # reload between two requests never mixes model versions or spaces
+        # data in one call
+        groups: Dict[Tuple[str, int, int], List[_PendingPrediction]] = defaultdict(list)
+        for pending in batch:
+            model = pending.models.get(pending.neighbourhood_id)
+            key = (pending.neighbourhood_id, id(model), id(pending.spaces_dict))
+            groups[key].append(pending)
+
+        # Every group is submitted before waiting for any, so they run in
+        # parallel in the process pool
+        submitted = [(group, self._submit(group)) for group in groups.values()]
+        for group, future in submitted:
+            try:
+                self._resolve(group, future.result())
+            except InferenceQueueFullError as e:
+                # Shed like single predictions are, retrying would only add load
+                for pending in group:
+                    pending.future.set_exception(e)
+            except Exception:
+                # Predict one by one so a bad request only fails itself
+                for pending in group:
+                    try:
+                        self._resolve([pending], self._submit([pending]).result())
+                    except Exception as e:
+                        pending.future.set_exception(e)
+
+    @staticmethod
+    def _timestamps(
+        group: List[_PendingPrediction],
+    ) -> Tuple[pd.DatetimeIndex, pd.DatetimeIndex]:
+        # Prophet returns its forecast sorted by date, so the unique sorted
+        # dates are predicted and mapped back to each request
+        timestamps = pd.DatetimeIndex([pending.timestamp for pending in group])
+        return timestamps, timestamps.unique().sort_values()
+
+    def _submit(self, group: List[_PendingPrediction]) -> Future:
+        first = group[0]
+        try:
+            return self.inference_executor.submit(
+                first.neighbourhood_id,
+                self._timestamps(group)[1],
+                first.models,
+                first.spaces_dict,
+            )
+        except Exception as e:
+            future: Future = Future()
+            future.set_exception(e)
+            return future
+
+    def _resolve(self, group: List[_PendingPrediction], predictions: Any) -> None:
+        timestamps, unique_timestamps = self._timestamps(group)
+        predictions = np.asarray(predictions)[unique_timestamps.get_indexer(timestamps)]
+        for pending, prediction in zip(group, predictions.tolist()):
+            pending.future.set_result(prediction)
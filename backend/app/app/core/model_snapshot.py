@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+from typing import Any, Callable, Dict, Optional
+
+from sermadrid.models import CompactProphetModelNH
+
+
+def _atomic_write(path: str, write: Callable[[Any], None]) -> None:
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ModelSnapshot:
+    """Local copy of the champion models, keyed by model name and version.
+
+    Every compact model loaded from MLflow is saved as
+    `<name>-v<version>.npz`, and the spaces data as `spaces-<run_id>.json`,
+    so a restarted backend only downloads the models whose champion version
+    changed. Files are written atomically, so a crash while saving never
+    leaves a partial entry behind.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _model_path(self, model_name: str, version: str) -> str:
+        return os.path.join(self.directory, f"{model_name}-v{version}.npz")
+
+    def _spaces_path(self, run_id: str) -> str:
+        return os.path.join(self.directory, f"spaces-{run_id}.json")
+
+    def load_model(
+        self, model_name: str, version: str
+    ) -> Optional[CompactProphetModelNH]:
+        path = self._model_path(model_name, version)
+        if not os.path.exists(path):
+            return None
+        return CompactProphetModelNH.load(path)
+
+    def save_model(
+        self, model_name: str, version: str, model: CompactProphetModelNH
+    ) -> None:
+        _atomic_write(self._model_path(model_name, version), model.save)
+
+    def load_spaces(self, run_id: str) -> Optional[Dict[str, Any]]:
+        path = self._spaces_path(run_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as json_file:
+            return json.load(json_file)
+
+    def save_spaces(self, run_id: str, spaces_dict: Dict[str, Any]) -> None:
+        _atomic_write(
+            self._spaces_path(run_id),
+            lambda f: f.write(json.dumps(spaces_dict).encode("utf-8")),
+        )
+
+    def prune(self, versions: Dict[str, str], spaces_run_id: str) -> None:
+        """Remove the entries not matching the current champion `versions`
+        and spaces run."""
+        keep = {
+            os.path.basename(self._model_path(model_name, version))
+            for model_name, version in versions.items()
+        }
+        keep.add(os.path.basename(self._spaces_path(spaces_run_id)))
+        for file_name in os.listdir(self.directory):
+            if file_name not in keep and not file_name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, file_name))
@@ -0,0 +1,126 @@
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+from sermadrid.models import CompactProphetModelNH
+
+MAGIC = b"SERMADRID-STORE1"
+ALIGNMENT = 64
+HEADER_LENGTH_BYTES = 8
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_model_store(
+    path: str,
+    models: Dict[str, CompactProphetModelNH],
+    spaces_dict: dict,
+    metadata: Optional[dict] = None,
+) -> None:
+    """Write the compact models and the spaces table into a single binary file.
+
+    The file holds a JSON manifest (spaces table, metadata, model scalars and
+    the offset, dtype and shape of every model array) followed by the raw
+    arrays, aligned so they can be memory-mapped without copies. It is written
+    to a temporary file and atomically renamed, so readers never see a partial
+    store and processes attached to a previous store keep their mapping.
+    """
+    manifest: Dict[str, Any] = {
+        "spaces": spaces_dict,
+        "metadata": metadata or {},
+        "models": {},
+    }
+    blobs = []
+    offset = 0
+    for name, model in models.items():
+        arrays = model.to_arrays()
+        entry: Dict[str, Any] = {
+            "scalars": {scalar: arrays[scalar].item() for scalar in model.SCALARS},
+            "arrays": {},
+        }
+        for array_name in model.ARRAYS:
+            array = np.ascontiguousarray(arrays[array_name])
+            offset = _align(offset)
+            entry["arrays"][array_name] = {
+                "offset": offset,
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+            }
+            blobs.append((offset, array))
+            offset += array.nbytes
+        manifest["models"][name] = entry
+
+    manifest_bytes = json.dumps(manifest).encode("utf-8")
+    data_start = _align(len(MAGIC) + HEADER_LENGTH_BYTES + len(manifest_bytes))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(manifest_bytes).to_bytes(HEADER_LENGTH_BYTES, "little"))
+            f.write(manifest_bytes)
+            for blob_offset, array in blobs:
+                f.seek(data_start + blob_offset)
+                f.write(array.tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ModelStore:
+    """Read-only view of a model store file written by `write_model_store`.
+
+    The model arrays are views over a single read-only memory map, so every
+    process attached to the same file shares one physical copy of them.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._mmap = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self._mmap[: len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a model store file")
+
+        manifest_start = len(MAGIC) + HEADER_LENGTH_BYTES
+        manifest_length = int.from_bytes(
+            bytes(self._mmap[len(MAGIC) : manifest_start]), "little"
+        )
+        manifest = json.loads(
+            bytes(self._mmap[manifest_start : manifest_start + manifest_length])
+        )
+        data_start = _align(manifest_start + manifest_length)
+
+        self.spaces_dict: dict = manifest["spaces"]
+        self.metadata: dict = manifest["metadata"]
+        self.models: Dict[str, CompactProphetModelNH] = {}
+        for name, entry in manifest["models"].items():
+            arrays = {
+                array_name: np.ndarray(
+                    shape=tuple(spec["shape"]),
+                    dtype=np.dtype(spec["dtype"]),
+                    buffer=self._mmap,
+                    offset=data_start + spec["offset"],
+                )
+                for array_name, spec in entry["arrays"].items()
+            }
+            self.models[name] = CompactProphetModelNH(**entry["scalars"], **arrays)
+
+
+@contextmanager
+def model_store_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive inter-process lock on the model store at `path`."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -1,19 +1,325 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
 from sermadrid.pipelines import SerMadridInferencePipeline
+from sermadrid.ser_calendar import closed_hours_mask
 
+from app.app.core.cache import LRUCache
+from app.app.core.forecast_grid import ForecastGrid, to_local_time
+from app.app.core.inference_executor import InferenceExecutor
+from app.app.core.metrics import PREDICTIONS, STAGE_DURATION, record_cache_lookups
+from app.app.core.micro_batcher import MicroBatcher
 
-def predict_parking_availability(
-    datetime_str: str, neighbourhood_id_str: str, models: dict, spaces_dict: dict
-) -> dict:
-    SERMADRID_INFERENCE = SerMadridInferencePipeline()
-    MODEL = models.get(neighbourhood_id_str)
 
-    prediction = SERMADRID_INFERENCE.run(
-        datetime=datetime_str,
-        model=MODEL,
+def run_inference(
+    datetime: str | pd.Timestamp | pd.DatetimeIndex,
+    neighbourhood_id_str: str,
+    models: dict,
+    spaces_dict: dict,
+    inference_executor: Optional[InferenceExecutor] = None,
+) -> List[float]:
+    if inference_executor is not None:
+        return inference_executor.run(
+            neighbourhood_id_str, datetime, models, spaces_dict
+        )
+
+    SERMADRID_INFERENCE = SerMadridInferencePipeline()
+    return SERMADRID_INFERENCE.run(
+        datetime=datetime,
+        model=models.get(neighbourhood_id_str),
         num_plazas=spaces_dict[neighbourhood_id_str]["num_plazas"],
         return_percentage=True,
-    )[0]
+    )
+
+
+def run_inference_many(
+    datetime: pd.Timestamp | pd.DatetimeIndex,
+    neighbourhood_ids: List[str],
+    models: dict,
+    spaces_dict: dict,
+    inference_executor: Optional[InferenceExecutor] = None,
+) -> np.ndarray:
+    if inference_executor is not None:
+        return inference_executor.run_many(
+            neighbourhood_ids, datetime, models, spaces_dict
+        )
+
+    return SerMadridInferencePipeline().run_many(
+        datetime=datetime,
+        models=[models[nid] for nid in neighbourhood_ids],
+        num_plazas=[spaces_dict[nid]["num_plazas"] for nid in neighbourhood_ids],
+        return_percentage=True,
+    )
+
+
+def predict_parking_availability(
+    datetime_str: str | pd.Timestamp,
+    neighbourhood_id_str: str,
+    models: dict,
+    spaces_dict: dict,
+    forecast_grid: Optional[ForecastGrid] = None,
+    micro_batcher: Optional[MicroBatcher] = None,
+    inference_executor: Optional[InferenceExecutor] = None,
+    prediction_cache: Optional[LRUCache] = None,
+) -> dict:
+    # The grid, the cache and the models all work in naive Madrid local time
+    timestamp = to_local_time(pd.Timestamp(datetime_str))
+    prediction = None
+    if forecast_grid is not None:
+        with STAGE_DURATION.labels(stage="grid_lookup").time():
+            prediction = forecast_grid.lookup(neighbourhood_id_str, timestamp)
+        record_cache_lookups(
+            "forecast_grid", prediction is not None, prediction is None
+        )
+
+    # Cached predictions are kept per hour, the resolution the models are
+    # trained on. The model is part of the key, so predictions of a model
+    # replaced by a reload are never served
+    cache_key = None
+    if prediction is None and prediction_cache is not None:
+        timestamp = timestamp.floor("h")
+        cache_key = (neighbourhood_id_str, timestamp, models.get(neighbourhood_id_str))
+        prediction = prediction_cache.get(cache_key)
+
+    # Fall back to live inference for datetimes outside the forecast grid
+    if prediction is None and micro_batcher is not None:
+        with STAGE_DURATION.labels(stage="inference").time():
+            prediction = micro_batcher.predict(
+                neighbourhood_id_str,
+                timestamp,
+                models,
+                spaces_dict,
+            )
+        if cache_key is not None:
+            prediction_cache.set(cache_key, prediction)
+    elif prediction is None:
+        with STAGE_DURATION.labels(stage="inference").time():
+            prediction = run_inference(
+                timestamp,
+                neighbourhood_id_str,
+                models,
+                spaces_dict,
+                inference_executor,
+            )[0]
+        if cache_key is not None:
+            prediction_cache.set(cache_key, prediction)
+    PREDICTIONS.labels(neighbourhood_id=neighbourhood_id_str).inc()
     return {
         "barrio": spaces_dict[neighbourhood_id_str]["barrio"],
         "prediction": prediction,
     }
+
+
+def predict_parking_availability_curve(
+    datetimes: pd.DatetimeIndex,
+    neighbourhood_id_str: str,
+    models: dict,
+    spaces_dict: dict,
+    forecast_grid: Optional[ForecastGrid] = None,
+    inference_executor: Optional[InferenceExecutor] = None,
+) -> np.ndarray:
+    if forecast_grid is not None:
+        predictions = forecast_grid.lookup_many(neighbourhood_id_str, datetimes)
+    else:
+        predictions = np.full(len(datetimes), np.nan)
+
+    # One inference call for the datetimes outside the forecast grid. Prophet
+    # returns its forecast sorted by date, so the unique sorted dates are
+    # predicted and mapped back to the input order
+    missing = np.isnan(predictions)
+    num_missing = int(missing.sum())
+    if forecast_grid is not None:
+        record_cache_lookups("forecast_grid", len(datetimes) - num_missing, num_missing)
+    if num_missing:
+        missing_datetimes = datetimes[missing]
+        unique_datetimes = missing_datetimes.unique().sort_values()
+        with STAGE_DURATION.labels(stage="inference").time():
+            unique_predictions = run_inference(
+                unique_datetimes,
+                neighbourhood_id_str,
+                models,
+                spaces_dict,
+                inference_executor,
+            )
+        predictions[missing] = np.asarray(unique_predictions)[
+            unique_datetimes.get_indexer(missing_datetimes)
+        ]
+    PREDICTIONS.labels(neighbourhood_id=neighbourhood_id_str).inc(len(datetimes))
+    return predictions
+
+
+def predict_parking_availability_batch(
+    datetimes: pd.DatetimeIndex,
+    neighbourhood_ids: List[str],
+    models: dict,
+    spaces_dict: dict,
+    forecast_grid: Optional[ForecastGrid] = None,
+    inference_executor: Optional[InferenceExecutor] = None,
+) -> List[dict]:
+    results = []
+    for neighbourhood_id_str in dict.fromkeys(neighbourhood_ids):
+        predictions = predict_parking_availability_curve(
+            datetimes,
+            neighbourhood_id_str,
+            models,
+            spaces_dict,
+            forecast_grid,
+            inference_executor,
+        )
+        results.append(
+            {
+                "neighbourhood_id": neighbourhood_id_str,
+                "barrio": spaces_dict[neighbourhood_id_str]["barrio"],
+                "datetimes": datetimes,
+                "predictions": predictions.tolist(),
+            }
+        )
+    return results
+
+
+def iter_parking_availability_curve(
+    datetimes: pd.DatetimeIndex,
+    neighbourhood_id_str: str,
+    models: dict,
+    spaces_dict: dict,
+    chunk_size: int,
+    forecast_grid: Optional[ForecastGrid] = None,
+    inference_executor: Optional[InferenceExecutor] = None,
+) -> Iterator[Tuple[pd.DatetimeIndex, np.ndarray]]:
+    """Yield the predictions of `datetimes` in chunks of `chunk_size`, so
+    callers can send the first ones before the whole range is computed."""
+    for chunk_start in range(0, len(datetimes), chunk_size):
+        chunk = datetimes[chunk_start : chunk_start + chunk_size]
+        yield (
+            chunk,
+            predict_parking_availability_curve(
+                chunk,
+                neighbourhood_id_str,
+                models,
+                spaces_dict,
+                forecast_grid,
+                inference_executor,
+            ),
+        )
+
+
+def find_best_parking_times(
+    datetimes: pd.DatetimeIndex,
+    neighbourhood_id_str: str,
+    models: dict,
+    spaces_dict: dict,
+    top_k: int,
+    include_closed: bool = False,
+    forecast_grid: Optional[ForecastGrid] = None,
+    inference_executor: Optional[InferenceExecutor] = None,
+) -> List[dict]:
+    """Return the `top_k` datetimes with the highest predicted availability.
+
+    The whole range is predicted at once and ranked with a single argsort,
+    ties going to the earliest datetime. Hours outside the SER schedule are
+    always fully available, so they are left out unless `include_closed`.
+    """
+    predictions = predict_parking_availability_curve(
+        datetimes,
+        neighbourhood_id_str,
+        models,
+        spaces_dict,
+        forecast_grid,
+        inference_executor,
+    )
+    candidates = np.arange(len(datetimes))
+    if not include_closed:
+        candidates = candidates[~closed_hours_mask(datetimes.values)]
+    best = candidates[np.argsort(-predictions[candidates], kind="stable")[:top_k]]
+    return [
+        {"datetime": datetimes[index], "prediction": float(predictions[index])}
+        for index in best
+    ]
+
+
+def predict_parking_availability_snapshot(
+    timestamp: pd.Timestamp,
+    models: dict,
+    spaces_dict: dict,
+    forecast_grid: Optional[ForecastGrid] = None,
+    neighbourhood_ids: Optional[List[str]] = None,
+    inference_executor: Optional[InferenceExecutor] = None,
+) -> Dict[str, dict]:
+    """Predict every neighbourhood at `timestamp`, or only `neighbourhood_ids`
+    if given."""
+    if neighbourhood_ids is not None:
+        models = {
+            neighbourhood_id_str: models[neighbourhood_id_str]
+            for neighbourhood_id_str in neighbourhood_ids
+            if neighbourhood_id_str in models
+        }
+    predictions = forecast_grid.column(timestamp) if forecast_grid else None
+    if forecast_grid is not None:
+        record_cache_lookups(
+            "forecast_grid", predictions is not None, predictions is None
+        )
+    if predictions is not None and neighbourhood_ids is not None:
+        predictions = {
+            neighbourhood_id_str: prediction
+            for neighbourhood_id_str, prediction in predictions.items()
+            if neighbourhood_id_str in models
+        }
+
+    # Fall back to live inference for datetimes outside the forecast grid, all
+    # the neighbourhoods in a single pass
+    if predictions is None:
+        predicted_ids = [
+            neighbourhood_id_str
+            for neighbourhood_id_str in models
+            if neighbourhood_id_str in spaces_dict
+        ]
+        with STAGE_DURATION.labels(stage="inference").time():
+            values = run_inference_many(
+                timestamp, predicted_ids, models, spaces_dict, inference_executor
+            )[:, 0]
+        predictions = dict(zip(predicted_ids, values.tolist()))
+    return {
+        neighbourhood_id_str: {
+            "barrio": spaces_dict[neighbourhood_id_str]["barrio"],
+            "prediction": prediction,
+        }
+        for neighbourhood_id_str, prediction in predictions.items()
+    }
+
+
+def rank_neighbourhoods_by_availability(
+    timestamp: pd.Timestamp,
+    distances: Dict[str, float],
+    models: dict,
+    spaces_dict: dict,
+    forecast_grid: Optional[ForecastGrid] = None,
+    inference_executor: Optional[InferenceExecutor] = None,
+) -> List[dict]:
+    """Rank the neighbourhoods of `distances` by their predicted availability
+    at `timestamp`, the closest first on ties.
+
+    All of them are predicted at once, from a single forecast grid column when
+    the hour is in the grid.
+    """
+    predictions = predict_parking_availability_snapshot(
+        timestamp,
+        models,
+        spaces_dict,
+        forecast_grid,
+        list(distances),
+        inference_executor,
+    )
+    neighbourhood_ids = list(predictions)
+    values = np.array([predictions[nid]["prediction"] for nid in neighbourhood_ids])
+    nearby = np.array([distances[nid] for nid in neighbourhood_ids])
+    return [
+        {
+            "neighbourhood_id": neighbourhood_ids[index],
+            "barrio": predictions[neighbourhood_ids[index]]["barrio"],
+            "distance_m": float(nearby[index]),
+            "prediction": float(values[index]),
+        }
+        # Sorted by the last key first
+        for index in np.lexsort((nearby, -values))
+    ]
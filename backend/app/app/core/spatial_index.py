@@ -0,0 +1,182 @@
+import json
+import math
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# Metres per degree of latitude, and of longitude at the equator
+METRES_PER_DEGREE_LAT = 110_540.0
+METRES_PER_DEGREE_LON = 111_320.0
+
+
+class Neighbourhood(NamedTuple):
+    neighbourhood_id: str
+    barrio: str
+    district: str
+    # Exterior and interior rings of every polygon, as (n, 2) lon/lat arrays
+    rings: List[np.ndarray]
+
+
+def neighbourhood_id_from_properties(properties: dict) -> str:
+    """Build the neighbourhood id the models are registered with, i.e. the
+    district code followed by the two-digit barrio code."""
+    return f"{properties['CODDIS']}{str(properties['CODBAR']).zfill(2)}"
+
+
+def _polygon_rings(geometry: dict) -> List[np.ndarray]:
+    polygons = (
+        [geometry["coordinates"]]
+        if geometry["type"] == "Polygon"
+        else geometry["coordinates"]
+    )
+    return [
+        np.asarray(ring, dtype=np.float64)[:, :2]
+        for polygon in polygons
+        for ring in polygon
+    ]
+
+
+def _contains(rings: List[np.ndarray], lon: float, lat: float) -> bool:
+    """Even-odd ray casting over all the rings, so holes are excluded."""
+    crossings = 0
+    for ring in rings:
+        x0, y0 = ring[:-1, 0], ring[:-1, 1]
+        x1, y1 = ring[1:, 0], ring[1:, 1]
+        straddles = (y0 > lat) != (y1 > lat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = x0 + (lat - y0) * (x1 - x0) / (y1 - y0)
+        crossings += int(np.count_nonzero(straddles & (lon < x_cross)))
+    return crossings % 2 == 1
+
+
+class SpatialIndex:
+    """Neighbourhood polygons indexed by a uniform grid of bounding boxes.
+
+    Every grid cell lists the neighbourhoods whose bounding box overlaps it,
+    so locating a point only runs the point-in-polygon test on the one or two
+    candidates of its cell. Distances use a local equirectangular projection,
+    accurate to well under a metre at the scale of a city.
+    """
+
+    def __init__(self, neighbourhoods: List[Neighbourhood], grid_size: int = 32):
+        self.neighbourhoods = neighbourhoods
+        self._by_id = {nh.neighbourhood_id: nh for nh in neighbourhoods}
+        self.bounds = np.array(
+            [
+                [
+                    min(ring[:, 0].min() for ring in nh.rings),
+                    min(ring[:, 1].min() for ring in nh.rings),
+                    max(ring[:, 0].max() for ring in nh.rings),
+                    max(ring[:, 1].max() for ring in nh.rings),
+                ]
+                for nh in neighbourhoods
+            ]
+        )
+        self.grid_size = grid_size
+        self._origin = self.bounds[:, :2].min(axis=0)
+        extent = self.bounds[:, 2:].max(axis=0) - self._origin
+        self._cell_size = extent / grid_size
+
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        first_cells = self._cell_of(self.bounds[:, 0], self.bounds[:, 1])
+        last_cells = self._cell_of(self.bounds[:, 2], self.bounds[:, 3])
+        for index, ((x0, y0), (x1, y1)) in enumerate(zip(first_cells, last_cells)):
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    self._cells.setdefault((x, y), []).append(index)
+
+        # Segments of all the rings, for the vectorized distance queries
+        segments = [
+            (index, ring[:-1], ring[1:])
+            for index, nh in enumerate(neighbourhoods)
+            for ring in nh.rings
+        ]
+        self._segment_owner = np.concatenate(
+            [np.full(len(start), index) for index, start, _ in segments]
+        )
+        self._segment_start = np.concatenate([start for _, start, _ in segments])
+        self._segment_end = np.concatenate([end for _, _, end in segments])
+
+    @classmethod
+    def from_geojson(cls, path: str, grid_size: int = 32) -> "SpatialIndex":
+        with open(path, "r") as geojson_file:
+            features = json.load(geojson_file)["features"]
+        return cls(
+            [
+                Neighbourhood(
+                    neighbourhood_id=neighbourhood_id_from_properties(
+                        feature["properties"]
+                    ),
+                    barrio=feature["properties"]["NOMBAR"],
+                    district=feature["properties"]["NOMDIS"],
+                    rings=_polygon_rings(feature["geometry"]),
+                )
+                for feature in features
+                # The area outside the SER zone has no barrio code
+                if str(feature["properties"]["CODBAR"]).isdigit()
+            ],
+            grid_size=grid_size,
+        )
+
+    def _cell_of(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        cells = np.floor(
+            (np.column_stack([lon, lat]) - self._origin) / self._cell_size
+        ).astype(int)
+        return np.clip(cells, 0, self.grid_size - 1)
+
+    def get(self, neighbourhood_id: str) -> Optional[Neighbourhood]:
+        return self._by_id.get(neighbourhood_id)
+
+    def locate(self, lat: float, lon: float) -> Optional[Neighbourhood]:
+        """Return the neighbourhood containing the point, if any."""
+        ((x, y),) = self._cell_of(np.array([lon]), np.array([lat]))
+        for index in self._cells.get((int(x), int(y)), []):
+            west, south, east, north = self.bounds[index]
+            if west <= lon <= east and south <= lat <= north:
+                if _contains(self.neighbourhoods[index].rings, lon, lat):
+                    return self.neighbourhoods[index]
+        return None
+
+    def nearest(
+        self, lat: float, lon: float, radius_m: float
+    ) -> List[Tuple[Neighbourhood, float]]:
+        """Return the neighbourhoods within `radius_m` metres of the point,
+        closest first, with their distance (0 for the one containing it)."""
+        scale = np.array(
+            [METRES_PER_DEGREE_LON * math.cos(math.radians(lat)), METRES_PER_DEGREE_LAT]
+        )
+        point = np.array([lon, lat])
+
+        # Bounding boxes first, a lower bound of the distance to each polygon
+        gap = np.maximum(
+            np.maximum(self.bounds[:, :2] - point, point - self.bounds[:, 2:]), 0
+        )
+        box_distance = np.hypot(*(gap * scale).T)
+        candidates = np.flatnonzero(box_distance <= radius_m)
+        if len(candidates) == 0:
+            return []
+
+        # Exact distance to the boundary of the candidates, over all their
+        # segments at once
+        selected = np.isin(self._segment_owner, candidates)
+        start = (self._segment_start[selected] - point) * scale
+        end = (self._segment_end[selected] - point) * scale
+        direction = end - start
+        length_2 = np.einsum("ij,ij->i", direction, direction)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(-np.einsum("ij,ij->i", start, direction) / length_2, 0, 1)
+        t = np.nan_to_num(t)
+        closest = start + t[:, None] * direction
+        segment_distance = np.hypot(closest[:, 0], closest[:, 1])
+
+        distances = np.full(len(self.neighbourhoods), np.inf)
+        np.minimum.at(distances, self._segment_owner[selected], segment_distance)
+        containing = self.locate(lat, lon)
+        if containing is not None:
+            distances[self.neighbourhoods.index(containing)] = 0.0
+
+        in_radius = candidates[distances[candidates] <= radius_m]
+        order = in_radius[np.argsort(distances[in_radius], kind="stable")]
+        return [
+            (self.neighbourhoods[index], float(distances[index])) for index in order
+        ]
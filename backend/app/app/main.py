@@ -2,12 +2,27 @@ import asyncio
 import time
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sermadrid.instrumentation import add_timing_hook
 from starlette.middleware.cors import CORSMiddleware
 
 from app.app.api.v1.router import api_router
+from app.app.core.admission import AdmissionMiddleware
 from app.app.core.config import settings
-from app.app.core.dependencies import is_data_loaded, load_data
+from app.app.core.dependencies import (
+    get_admission_controller,
+    get_inference_executor,
+    is_data_loaded,
+    load_data,
+    load_geojson_tiles,
+    load_spatial_index,
+    reload_data,
+    roll_forecast_grid,
+)
+from app.app.core.inference_executor import InferenceQueueFullError
+from app.app.core.metrics import REQUEST_DURATION, observe_stage
 
 
 async def retry_load_data(duration_hours: int = 12, retry_delay: int = 10):
@@ -15,7 +30,7 @@ async def retry_load_data(duration_hours: int = 12, retry_delay: int = 10):
     attempt = 1
 
     while time.time() < end_time:
-        if load_data():
+        if await asyncio.to_thread(load_data):
             print("Data loaded successfully")
             return
         print(f"Attempt {attempt} failed. Retrying in {retry_delay} seconds...")
@@ -25,14 +40,76 @@ async def retry_load_data(duration_hours: int = 12, retry_delay: int = 10):
     print(f"Failed to load data after {duration_hours} hours")
 
 
+async def roll_forecast_grid_hourly():
+    while True:
+        # Wake up right after the next hour boundary
+        await asyncio.sleep(3600 - time.time() % 3600 + 1)
+        if is_data_loaded():
+            await asyncio.to_thread(roll_forecast_grid)
+
+
+async def watch_champion_models(interval_seconds: int):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        if is_data_loaded():
+            await asyncio.to_thread(reload_data)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    load_spatial_index()
+    load_geojson_tiles()
     asyncio.create_task(retry_load_data())
+    asyncio.create_task(roll_forecast_grid_hourly())
+    if settings.MODEL_RELOAD_INTERVAL_SECONDS > 0:
+        asyncio.create_task(
+            watch_champion_models(settings.MODEL_RELOAD_INTERVAL_SECONDS)
+        )
     yield
+    get_inference_executor().shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
 
+# Report the inference stages timed inside the sermadrid models
+add_timing_hook(observe_stage)
+
+
+@app.exception_handler(InferenceQueueFullError)
+async def inference_queue_full_handler(
+    request: Request, exc: InferenceQueueFullError
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Inference queue full: {exc}"},
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)},
+    )
+
+
+# Only the prediction endpoints are limited, health checks and metrics must keep
+# answering under load
+app.add_middleware(
+    AdmissionMiddleware,
+    get_controller=get_admission_controller,
+    path_prefix="/api/v1/items",
+    retry_after_seconds=settings.ADMISSION_RETRY_AFTER_SECONDS,
+)
+
+
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, raw paths embed the requested datetimes
+    route = request.scope.get("route")
+    REQUEST_DURATION.labels(
+        route=route.path if route is not None else "unmatched",
+        method=request.method,
+        status=str(response.status_code),
+    ).observe(time.perf_counter() - start)
+    return response
+
+
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
         CORSMiddleware,
@@ -48,3 +125,11 @@ app.include_router(api_router)
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "data_loaded": is_data_loaded()}
+
+
+@app.get("/metrics")
+async def metrics():
+    # Set as a header, as media_type would append a second charset
+    return Response(
+        content=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
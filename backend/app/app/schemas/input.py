@@ -1,6 +1,8 @@
 from datetime import datetime
+from enum import Enum
+from typing import List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 # TODO: Use in endpoints
@@ -11,3 +13,13 @@ class Location(BaseModel):
 
 class DateTime(BaseModel):
     datetime: datetime
+
+
+class BatchPredictionRequest(BaseModel):
+    neighbourhood_ids: List[str] = Field(..., min_length=1)
+    datetimes: List[datetime] = Field(..., min_length=1)
+
+
+class CurveFormat(str, Enum):
+    ndjson = "ndjson"
+    columnar = "columnar"
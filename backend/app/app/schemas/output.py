@@ -1,6 +1,54 @@
+from datetime import datetime
+from typing import Dict, List
+
 from pydantic import BaseModel
 
 
 class ParkingResult(BaseModel):
     barrio: str
     prediction: float
+
+
+class NeighbourhoodForecast(BaseModel):
+    neighbourhood_id: str
+    barrio: str
+    datetimes: List[datetime]
+    predictions: List[float]
+
+
+class BatchParkingResult(BaseModel):
+    results: List[NeighbourhoodForecast]
+
+
+class SnapshotResult(BaseModel):
+    datetime: datetime
+    predictions: Dict[str, ParkingResult]
+
+
+class TimeSlot(BaseModel):
+    datetime: datetime
+    prediction: float
+
+
+class BestTimeResult(BaseModel):
+    neighbourhood_id: str
+    barrio: str
+    slots: List[TimeSlot]
+
+
+class NeighbourhoodLocation(BaseModel):
+    neighbourhood_id: str
+    barrio: str
+    district: str
+
+
+class NearbyNeighbourhood(BaseModel):
+    neighbourhood_id: str
+    barrio: str
+    distance_m: float
+    prediction: float
+
+
+class NearestResult(BaseModel):
+    datetime: datetime
+    neighbourhoods: List[NearbyNeighbourhood]
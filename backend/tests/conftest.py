@@ -0,0 +1,68 @@
+import os
+
+os.environ.setdefault("BACKEND_CORS_ORIGINS", '["http://localhost"]')
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sermadrid.models import CompactProphetModelNH  # noqa: E402
+
+from app.app.core import dependencies  # noqa: E402
+from app.app.core.forecast_grid import ForecastGrid  # noqa: E402
+from app.app.main import app  # noqa: E402
+
+NEIGHBOURHOOD_IDS = ["101", "204"]
+
+
+def make_model(barrio_id: int) -> CompactProphetModelNH:
+    """Compact model with a linear trend and daily and weekly seasonalities,
+    so the predictions change within the hour."""
+    rng = np.random.default_rng(barrio_id)
+    fourier_orders = np.array([4, 3])
+    num_features = 2 * int(fourier_orders.sum())
+    return CompactProphetModelNH(
+        barrio_id=barrio_id,
+        start_ns=pd.Timestamp("2023-01-01").value,
+        t_scale_ns=pd.Timedelta(days=365).value,
+        k=0.01,
+        m=0.3,
+        linear=True,
+        changepoints_t=np.array([0.5]),
+        deltas=np.array([0.0]),
+        y_scale=100.0,
+        floor=0.0,
+        periods=np.array([1.0, 7.0]),
+        fourier_orders=fourier_orders,
+        beta_additive=rng.normal(0, 0.1, (1, num_features)),
+        beta_multiplicative=np.zeros((1, num_features)),
+    )
+
+
+@pytest.fixture(autouse=True)
+def serving_state(monkeypatch):
+    """Serve the test models, with a one day forecast grid from now."""
+    models = {nid: make_model(int(nid)) for nid in NEIGHBOURHOOD_IDS}
+    spaces_dict = {
+        nid: {"barrio": f"BARRIO {nid}", "num_plazas": 100} for nid in NEIGHBOURHOOD_IDS
+    }
+    forecast_grid = ForecastGrid(horizon_hours=24)
+    forecast_grid.build(models, spaces_dict)
+    state = dependencies.ServingState(
+        models=models,
+        spaces_dict=spaces_dict,
+        versions={nid: "1" for nid in NEIGHBOURHOOD_IDS},
+        forecast_grid=forecast_grid,
+    )
+    monkeypatch.setattr(dependencies, "serving_state", state)
+    monkeypatch.setattr(dependencies, "data_loaded", True)
+    dependencies.snapshot_cache.clear()
+    dependencies.prediction_cache.clear()
+    return state
+
+
+@pytest.fixture
+def client() -> TestClient:
+    # Not used as a context manager, so the startup does not load the
+    # champion models from MLflow
+    return TestClient(app)
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app.app.core import dependencies
+from app.app.core.admission import AdmissionController
+from app.app.main import app
+
+CURVE_PATH = "/api/v1/items/curve/neighbourhood_id/101"
+
+
+def http_scope(path: str, query_string: bytes = b"") -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string,
+        "headers": [],
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+
+
+def request_receiver():
+    """ASGI receive sending an empty request, then waiting like a connected
+    client would."""
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive() -> dict:
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()
+
+    return receive
+
+
+@pytest.fixture
+def admission_controller(monkeypatch) -> AdmissionController:
+    controller = AdmissionController(
+        max_concurrency=1, max_queued=0, queue_timeout_seconds=1.0
+    )
+    monkeypatch.setattr(dependencies, "admission_controller", controller)
+    return controller
+
+
+def test_slot_held_while_streaming_curve(admission_controller):
+    # A week in chunks of a day, so the body is sent in several messages
+    curve_scope = http_scope(
+        CURVE_PATH, b"start=2030-11-18T00:00:00&end=2030-11-25T00:00:00"
+    )
+    in_flight = []
+    rejected = []
+
+    async def send(message: dict) -> None:
+        if message["type"] != "http.response.body":
+            return
+        in_flight.append(admission_controller.in_flight)
+        if message.get("more_body", False) and not rejected:
+            # The slot of the curve is still taken, so any other request is
+            # shed while its body is being consumed
+            statuses = []
+
+            async def send_other(other_message: dict) -> None:
+                if other_message["type"] == "http.response.start":
+                    statuses.append(other_message["status"])
+
+            await app(http_scope(CURVE_PATH), request_receiver(), send_other)
+            rejected.extend(statuses)
+
+    asyncio.run(app(curve_scope, request_receiver(), send))
+
+    assert len(in_flight) > 2
+    assert in_flight[:-1] == [1] * (len(in_flight) - 1)
+    assert rejected == [503]
+    assert admission_controller.in_flight == 0
@@ -0,0 +1,20 @@
+import pytest
+
+ITEMS_URL = "/api/v1/items"
+
+
+@pytest.mark.parametrize("datetime_str", ["2030-11-19T11:30:00", "2030-11-19T11:59:59"])
+def test_batch_matches_single_prediction_out_of_grid(client, datetime_str):
+    # Far beyond the forecast grid and not on the hour, so both are predicted
+    # live, for the hour the datetime falls in
+    single = client.get(f"{ITEMS_URL}/datetime/{datetime_str}/neighbourhood_id/101")
+    batch = client.post(
+        f"{ITEMS_URL}/batch",
+        json={"neighbourhood_ids": ["101"], "datetimes": [datetime_str]},
+    )
+
+    assert single.status_code == 200
+    assert batch.status_code == 200
+    [result] = batch.json()["results"]
+    assert result["predictions"] == [single.json()["prediction"]]
+    assert result["datetimes"] == ["2030-11-19T11:00:00"]
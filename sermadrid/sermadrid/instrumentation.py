@@ -0,0 +1,37 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+
+TimingHook = Callable[[str, float], None]
+
+_timing_hooks: List[TimingHook] = []
+
+
+def add_timing_hook(hook: TimingHook) -> None:
+    """Register `hook(stage, seconds)` to be called after every timed stage."""
+    if hook not in _timing_hooks:
+        _timing_hooks.append(hook)
+
+
+def remove_timing_hook(hook: TimingHook) -> None:
+    if hook in _timing_hooks:
+        _timing_hooks.remove(hook)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the enclosed block and report it to the registered hooks.
+
+    Nothing is measured while no hook is registered, so the inference code
+    can be instrumented at no cost for the callers not collecting metrics.
+    """
+    if not _timing_hooks:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        for hook in _timing_hooks:
+            hook(stage, duration)
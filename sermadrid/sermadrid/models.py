@@ -1,16 +1,48 @@
+from typing import Dict, Optional, Sequence, Tuple
+
 import numpy as np
 import pandas as pd
 from prophet import Prophet
 from prophet.serialize import model_from_json, model_to_json
-from workalendar.europe import CommunityofMadrid
 
 import mlflow
+from sermadrid.instrumentation import timed
+from sermadrid.ser_calendar import closed_hours_mask
+
+NANOSECONDS_TO_SECONDS = 1000**3
+
+
+def _fourier_series(ds_ns: np.ndarray, period: float, series_order: int) -> np.ndarray:
+    # Same computation as `Prophet.fourier_series`, on int64 nanoseconds
+    t = ds_ns // NANOSECONDS_TO_SECONDS / (3600 * 24.0)
+    x_T = t * np.pi * 2
+    fourier_components = np.empty((ds_ns.shape[0], 2 * series_order))
+    for i in range(series_order):
+        c = x_T * (i + 1) / period
+        fourier_components[:, 2 * i] = np.sin(c)
+        fourier_components[:, (2 * i) + 1] = np.cos(c)
+    return fourier_components
+
+
+def _piecewise_linear(
+    t: np.ndarray,
+    deltas: np.ndarray,
+    k: float,
+    m: float,
+    changepoint_ts: np.ndarray,
+) -> np.ndarray:
+    # Same computation as `Prophet.piecewise_linear`
+    deltas_t = (changepoint_ts[None, :] <= t[..., None]) * deltas
+    k_t = deltas_t.sum(axis=1) + k
+    m_t = (deltas_t * -changepoint_ts).sum(axis=1) + m
+    return k_t * t + m_t
 
 
 class CustomProphetModelNH(mlflow.pyfunc.PythonModel):
     def __init__(self, barrio_id: int) -> None:
         self.model = None
         self.barrio_id = barrio_id
+        self._compact = None
         super().__init__()
 
     def __str__(self) -> str:
@@ -30,6 +62,7 @@ class CustomProphetModelNH(mlflow.pyfunc.PythonModel):
     def _build_model(self, **params) -> Prophet:
         custom_daily_fourier = params.pop("custom_daily_fourier", 8)
         self.model = Prophet(**params)
+        self._compact = None
         self.model.add_seasonality(
             name="custom_daily", period=1, fourier_order=custom_daily_fourier
         )
@@ -57,42 +90,69 @@ class CustomProphetModelNH(mlflow.pyfunc.PythonModel):
         prophet_train_df = self._create_train_df(y_train=y_train, agg_df=nh_agg_df)
         self.model.fit(prophet_train_df)
 
-    def inference(self, dates: np.ndarray) -> np.ndarray:
+    def _supports_fast_inference(self) -> bool:
+        return (
+            self.model.growth in ("linear", "flat")
+            and not self.model.logistic_floor
+            and not self.model.extra_regressors
+            and self.model.holidays is None
+            and self.model.country_holidays is None
+            and all(
+                props["condition_name"] is None
+                for props in self.model.seasonalities.values()
+            )
+        )
+
+    def to_compact(self) -> "CompactProphetModelNH":
+        """Export the numbers needed for inference into a compact model."""
+        if not self._supports_fast_inference():
+            raise ValueError("Model uses features not supported by the compact model")
+        model = self.model
+        return CompactProphetModelNH(
+            barrio_id=self.barrio_id,
+            start_ns=model.start.value,
+            t_scale_ns=model.t_scale.value,
+            k=np.nanmean(model.params["k"]),
+            m=np.nanmean(model.params["m"]),
+            linear=model.growth == "linear",
+            changepoints_t=np.asarray(model.changepoints_t, dtype=np.float64),
+            deltas=np.nanmean(model.params["delta"], axis=0),
+            y_scale=model.y_scale,
+            floor=0.0 if model.scaling == "absmax" else model.y_min,
+            periods=np.array(
+                [props["period"] for props in model.seasonalities.values()],
+                dtype=np.float64,
+            ),
+            fourier_orders=np.array(
+                [props["fourier_order"] for props in model.seasonalities.values()],
+                dtype=np.int64,
+            ),
+            beta_additive=model.params["beta"]
+            * model.train_component_cols["additive_terms"].values,
+            beta_multiplicative=model.params["beta"]
+            * model.train_component_cols["multiplicative_terms"].values,
+        )
+
+    def inference(self, dates: np.ndarray, fast: bool = True) -> np.ndarray:
+        if fast and self._supports_fast_inference():
+            if self._compact is None:
+                self._compact = self.to_compact()
+            return self._compact.inference(dates)
+
         prophet_predict_df = pd.DataFrame({"ds": pd.to_datetime(dates)})
-        forecast = self.model.predict(prophet_predict_df)
-
-        forecast["on_sunday"] = (forecast.ds.dt.dayofweek == 6).astype(int)
-        forecast["night"] = (
-            (forecast.ds.dt.hour >= 21) | (forecast.ds.dt.hour < 9)
-        ).astype(int)
-        forecast["saturday_afternoon"] = (
-            (forecast.ds.dt.dayofweek == 5)
-            & (forecast.ds.dt.hour >= 15)
-            & (forecast.ds.dt.hour < 21)
-        ).astype(int)
-        forecast["august_afternoon"] = (
-            (forecast.ds.dt.month == 8)
-            & (forecast.ds.dt.dayofweek < 5)
-            & (forecast.ds.dt.hour >= 15)
-            & (forecast.ds.dt.hour < 21)
-        ).astype(int)
-        madrid_holidays = CommunityofMadrid()
-        forecast["madrid_holidays"] = forecast.ds.dt.date.apply(
-            madrid_holidays.is_holiday
-        ).astype(int)
-
-        forecast.loc[forecast["on_sunday"] == 1, "yhat"] = 0
-        forecast.loc[forecast["night"] == 1, "yhat"] = 0
-        forecast.loc[forecast["saturday_afternoon"] == 1, "yhat"] = 0
-        forecast.loc[forecast["august_afternoon"] == 1, "yhat"] = 0
-        forecast.loc[forecast["madrid_holidays"] == 1, "yhat"] = 0
+        with timed("prophet_predict"):
+            forecast = self.model.predict(prophet_predict_df)
 
+        # No tickets are active outside the SER schedule
         y_pred_prophet = forecast["yhat"].values
-        y_pred_prophet = np.where(y_pred_prophet < 0, 0, y_pred_prophet)
+        with timed("closed_hours_mask"):
+            closed = closed_hours_mask(forecast["ds"].values)
+        y_pred_prophet = np.where(closed | (y_pred_prophet < 0), 0, y_pred_prophet)
         return y_pred_prophet
 
     def __getstate__(self):
         state = self.__dict__.copy()
+        state.pop("_compact", None)
         if self.model:
             state["model_json"] = model_to_json(self.model)
             del state["model"]
@@ -104,6 +164,198 @@ class CustomProphetModelNH(mlflow.pyfunc.PythonModel):
             self.model = model_from_json(state["model_json"])
         else:
             self.model = None
+        self._compact = None
 
     def predict(self, context, model_input):
         return self.model.inference(dates=model_input)
+
+
+class CompactProphetModelNH:
+    """Inference-only representation of a fitted `CustomProphetModelNH`.
+
+    Keeps only the fitted parameters `Prophet.predict` needs to compute `yhat`
+    (trend changepoints and rates, seasonality betas and scaling constants) in
+    a few NumPy arrays, instead of the full Prophet object with its training
+    history. Predictions are bit-compatible with `CustomProphetModelNH`.
+    """
+
+    __slots__ = (
+        "barrio_id",
+        "start_ns",
+        "t_scale_ns",
+        "k",
+        "m",
+        "linear",
+        "changepoints_t",
+        "deltas",
+        "y_scale",
+        "floor",
+        "periods",
+        "fourier_orders",
+        "beta_additive",
+        "beta_multiplicative",
+    )
+
+    SCALARS = (
+        "barrio_id",
+        "start_ns",
+        "t_scale_ns",
+        "k",
+        "m",
+        "linear",
+        "y_scale",
+        "floor",
+    )
+    ARRAYS = (
+        "changepoints_t",
+        "deltas",
+        "periods",
+        "fourier_orders",
+        "beta_additive",
+        "beta_multiplicative",
+    )
+
+    def __init__(
+        self,
+        barrio_id: int,
+        start_ns: int,
+        t_scale_ns: int,
+        k: float,
+        m: float,
+        linear: bool,
+        changepoints_t: np.ndarray,
+        deltas: np.ndarray,
+        y_scale: float,
+        floor: float,
+        periods: np.ndarray,
+        fourier_orders: np.ndarray,
+        beta_additive: np.ndarray,
+        beta_multiplicative: np.ndarray,
+    ) -> None:
+        self.barrio_id = int(barrio_id)
+        self.start_ns = int(start_ns)
+        self.t_scale_ns = int(t_scale_ns)
+        self.k = float(k)
+        self.m = float(m)
+        self.linear = bool(linear)
+        self.changepoints_t = changepoints_t
+        self.deltas = deltas
+        self.y_scale = float(y_scale)
+        self.floor = float(floor)
+        self.periods = periods
+        self.fourier_orders = fourier_orders
+        self.beta_additive = beta_additive
+        self.beta_multiplicative = beta_multiplicative
+
+    def __str__(self) -> str:
+        return "Compact Facebook Prophet"
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Export the model as a flat dict of NumPy arrays."""
+        arrays = {name: np.asarray(getattr(self, name)) for name in self.SCALARS}
+        arrays.update({name: getattr(self, name) for name in self.ARRAYS})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "CompactProphetModelNH":
+        params = {name: arrays[name][()] for name in cls.SCALARS}
+        params.update({name: arrays[name] for name in cls.ARRAYS})
+        return cls(**params)
+
+    def save(self, path: str) -> None:
+        np.savez(path, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path: str) -> "CompactProphetModelNH":
+        with np.load(path) as arrays:
+            return cls.from_arrays(dict(arrays))
+
+    def _seasonality_features(self, ds_values: np.ndarray) -> np.ndarray:
+        # Prophet multiplies a Fortran-ordered features matrix, which must be
+        # kept for the matmul to sum in the same order
+        ds_ns = ds_values.astype(np.int64)
+        return np.asfortranarray(
+            np.concatenate(
+                [
+                    _fourier_series(ds_ns, period, fourier_order)
+                    for period, fourier_order in zip(self.periods, self.fourier_orders)
+                ],
+                axis=1,
+            )
+        )
+
+    def _predict_yhat(
+        self, ds_values: np.ndarray, X: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Evaluate `yhat` following the same operations as `Prophet.predict`,
+        so the result is bit-compatible with its `yhat` column. `X` are the
+        seasonality features of the dates, computed if not given."""
+        # Trend
+        t = (ds_values - np.datetime64(self.start_ns, "ns")) / np.timedelta64(
+            self.t_scale_ns, "ns"
+        )
+        if self.linear:
+            trend = _piecewise_linear(
+                t, self.deltas, self.k, self.m, self.changepoints_t
+            )
+        else:
+            trend = np.repeat(self.m, len(t))
+        trend = trend * self.y_scale + self.floor
+
+        # Seasonalities
+        if X is None:
+            X = self._seasonality_features(ds_values)
+        additive_terms = np.nanmean(
+            np.matmul(X, self.beta_additive.transpose()) * self.y_scale, axis=1
+        )
+        multiplicative_terms = np.nanmean(
+            np.matmul(X, self.beta_multiplicative.transpose()), axis=1
+        )
+        return trend * (1 + multiplicative_terms) + additive_terms
+
+    def inference(self, dates: np.ndarray) -> np.ndarray:
+        # Sorted like `Prophet.predict` does with its input dates
+        ds = pd.DatetimeIndex(pd.to_datetime(dates)).as_unit("ns").sort_values()
+        if ds.tz is not None:
+            raise ValueError("Dates with timezone are not supported.")
+        ds_values = ds.values
+        with timed("compact_predict"):
+            y_pred_prophet = self._predict_yhat(ds_values)
+
+        # No tickets are active outside the SER schedule
+        with timed("closed_hours_mask"):
+            closed = closed_hours_mask(ds_values)
+        y_pred_prophet = np.where(closed | (y_pred_prophet < 0), 0, y_pred_prophet)
+        return y_pred_prophet
+
+
+def compact_inference(
+    models: Sequence[CompactProphetModelNH], dates: np.ndarray
+) -> np.ndarray:
+    """Predict the same dates with several compact models, one row per model.
+
+    The date features, i.e. the seasonality features of every distinct set of
+    seasonalities and the SER schedule mask, are computed once for all the
+    models. Every row is bit-compatible with the `inference` of its model.
+    """
+    ds = pd.DatetimeIndex(pd.to_datetime(dates)).as_unit("ns").sort_values()
+    if ds.tz is not None:
+        raise ValueError("Dates with timezone are not supported.")
+    ds_values = ds.values
+    with timed("closed_hours_mask"):
+        closed = closed_hours_mask(ds_values)
+    predictions = np.zeros((len(models), len(ds_values)))
+    if closed.all():
+        return predictions
+
+    features: Dict[Tuple[Tuple[float, ...], Tuple[int, ...]], np.ndarray] = {}
+    with timed("compact_predict"):
+        for row, model in enumerate(models):
+            key = (tuple(model.periods.tolist()), tuple(model.fourier_orders.tolist()))
+            if key not in features:
+                features[key] = model._seasonality_features(ds_values)
+            y_pred_prophet = model._predict_yhat(ds_values, features[key])
+            predictions[row] = np.where(
+                closed | (y_pred_prophet < 0), 0, y_pred_prophet
+            )
+    return predictions
@@ -1,16 +1,20 @@
-from typing import List
+from typing import List, Sequence
 
 import numpy as np
 import pandas as pd
 
-from sermadrid.models import CustomProphetModelNH
+from sermadrid.models import (
+    CompactProphetModelNH,
+    CustomProphetModelNH,
+    compact_inference,
+)
 
 
 # TODO: Move to backend?
 class SerMadridInferencePipeline:
     def _inference(
         self,
-        model: CustomProphetModelNH,
+        model: CustomProphetModelNH | CompactProphetModelNH,
         datetime: pd.Timestamp | pd.DatetimeIndex,
     ) -> List[float]:
         if not isinstance(datetime, (pd.DatetimeIndex, list)):
@@ -25,7 +29,7 @@ class SerMadridInferencePipeline:
     def run(
         self,
         datetime: pd.Timestamp | pd.DatetimeIndex,
-        model: CustomProphetModelNH,
+        model: CustomProphetModelNH | CompactProphetModelNH,
         num_plazas: int,
         return_percentage: bool = False,
     ) -> List[float]:
@@ -38,3 +42,36 @@ class SerMadridInferencePipeline:
             predictions = np.maximum(0, 1 - (predictions / num_plazas))
 
         return predictions
+
+    def run_many(
+        self,
+        datetime: pd.Timestamp | pd.DatetimeIndex,
+        models: Sequence[CustomProphetModelNH | CompactProphetModelNH],
+        num_plazas: Sequence[int],
+        return_percentage: bool = False,
+    ) -> np.ndarray:
+        """Run the inference of several models on the same datetimes, one row
+        per model. The compact models are all predicted in a single pass."""
+        dates = (
+            datetime if isinstance(datetime, (pd.DatetimeIndex, list)) else [datetime]
+        )
+        predictions = np.empty((len(models), len(dates)))
+        compact_rows = [
+            row
+            for row, model in enumerate(models)
+            if isinstance(model, CompactProphetModelNH)
+        ]
+        if compact_rows:
+            predictions[compact_rows] = compact_inference(
+                [models[row] for row in compact_rows], dates
+            )
+        for row, model in enumerate(models):
+            if not isinstance(model, CompactProphetModelNH):
+                predictions[row] = self._inference(model=model, datetime=dates)
+
+        if return_percentage:
+            predictions = np.maximum(
+                0, 1 - (predictions / np.asarray(num_plazas)[:, None])
+            )
+
+        return predictions
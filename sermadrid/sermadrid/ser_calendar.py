@@ -0,0 +1,108 @@
+import threading
+from typing import Optional
+
+import numpy as np
+from workalendar.europe import CommunityofMadrid
+
+HOURS_PER_WEEK = 7 * 24
+# 1970-01-01 (day 0) was a Thursday
+EPOCH_DAYOFWEEK = 3
+
+
+def _build_closed_hours_table() -> np.ndarray:
+    """Build the (month, hour of week) table of hours outside the SER schedule.
+
+    The SER zone is not regulated on Sundays, at night (21:00 to 9:00), on
+    Saturday afternoons and on weekday afternoons in August.
+    """
+    month = np.arange(1, 13)[:, None]
+    hour_of_week = np.arange(HOURS_PER_WEEK)[None, :]
+    dayofweek = hour_of_week // 24
+    hour = hour_of_week % 24
+
+    on_sunday = dayofweek == 6
+    night = (hour >= 21) | (hour < 9)
+    saturday_afternoon = (dayofweek == 5) & (hour >= 15) & (hour < 21)
+    august_afternoon = (month == 8) & (dayofweek < 5) & (hour >= 15) & (hour < 21)
+    return on_sunday | night | saturday_afternoon | august_afternoon
+
+
+class SerCalendar:
+    """Vectorized SER schedule shared by feature engineering and inference.
+
+    Madrid holidays are precomputed once into a bitmap of days for a range of
+    years, extended on demand, so checking any number of dates is a couple of
+    array lookups instead of a call to `CommunityofMadrid.is_holiday` per date.
+    """
+
+    def __init__(self, start_year: int = 2020, end_year: int = 2030) -> None:
+        self._closed_hours = _build_closed_hours_table()
+        self._lock = threading.Lock()
+        self._build_holidays(start_year, end_year)
+
+    def _build_holidays(self, start_year: int, end_year: int) -> None:
+        calendar = CommunityofMadrid()
+        first_day = np.datetime64(f"{start_year}-01-01", "D")
+        last_day = np.datetime64(f"{end_year}-12-31", "D")
+        holidays = np.zeros((last_day - first_day).astype(int) + 1, dtype=bool)
+        for year in range(start_year, end_year + 1):
+            for day, _ in calendar.holidays(year):
+                holidays[(np.datetime64(day, "D") - first_day).astype(int)] = True
+
+        # Swapped in a single assignment so concurrent readers never see a
+        # bitmap with the bounds of another one
+        self._holidays = (
+            start_year,
+            end_year,
+            first_day.astype(np.int64),
+            len(holidays),
+            np.packbits(holidays),
+        )
+
+    def _holiday_days(self, days: np.ndarray) -> np.ndarray:
+        """Look up `days` (int64 days since epoch) in the holidays bitmap."""
+        start_year, end_year, first_day, num_days, bitmap = self._holidays
+        if len(days) and (days.min() < first_day or days.max() >= first_day + num_days):
+            with self._lock:
+                years = (
+                    np.array([days.min(), days.max()])
+                    .astype("datetime64[D]")
+                    .astype("datetime64[Y]")
+                    .astype(int)
+                    + 1970
+                )
+                self._build_holidays(min(start_year, years[0]), max(end_year, years[1]))
+            start_year, end_year, first_day, num_days, bitmap = self._holidays
+
+        offsets = days - first_day
+        return ((bitmap[offsets >> 3] >> (7 - (offsets & 7))) & 1).astype(bool)
+
+    def is_holiday(self, dates: np.ndarray) -> np.ndarray:
+        """Return a boolean mask of the `dates` falling on a Madrid holiday."""
+        days = np.asarray(dates, dtype="datetime64[ns]").astype("datetime64[D]")
+        return self._holiday_days(days.astype(np.int64))
+
+    def closed_mask(self, dates: np.ndarray) -> np.ndarray:
+        """Return a boolean mask of the `dates` outside the SER schedule."""
+        values = np.asarray(dates, dtype="datetime64[ns]")
+        days = values.astype("datetime64[D]").astype(np.int64)
+        hour = values.astype("datetime64[h]").astype(np.int64) - days * 24
+        dayofweek = (days + EPOCH_DAYOFWEEK) % 7
+        month = values.astype("datetime64[M]").astype(np.int64) % 12
+        closed = self._closed_hours[month, dayofweek * 24 + hour]
+        return closed | self._holiday_days(days)
+
+
+_default_calendar: Optional[SerCalendar] = None
+
+
+def get_ser_calendar() -> SerCalendar:
+    global _default_calendar
+    if _default_calendar is None:
+        _default_calendar = SerCalendar()
+    return _default_calendar
+
+
+def closed_hours_mask(dates: np.ndarray) -> np.ndarray:
+    """Return a boolean mask of the `dates` outside the SER schedule."""
+    return get_ser_calendar().closed_mask(dates)
@@ -8,6 +8,7 @@ from zenml.logger import get_logger
 from steps.feature_engineering.data_aggregator import data_aggregator
 from steps.feature_engineering.data_loader import (
     parkings_data_loader,
+    parkings_source_fingerprints,
     spaces_data_loader,
 )
 from steps.feature_engineering.data_preprocessor import (
@@ -42,7 +43,9 @@ def feature_engineering() -> Tuple[pd.DataFrame, dict]:
         The processed parkings dataset (raw_ser_df).
         The processed spaces dict (spaces_clean).
     """
-    raw_ser_df = parkings_data_loader()
+    raw_ser_df = parkings_data_loader(
+        source_fingerprints=parkings_source_fingerprints(),
+    )
     raw_spaces_df = spaces_data_loader()
     ser_df = parkings_data_preprocessor(
         raw_ser_df=raw_ser_df,
@@ -1,12 +1,10 @@
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
+from sermadrid.ser_calendar import closed_hours_mask
 from typing_extensions import Annotated
 from zenml import step
 from zenml.logger import get_logger
 
-tqdm.pandas(desc="Processing rows")
-
 logger = get_logger(__name__)
 
 
@@ -25,65 +23,38 @@ def data_aggregator(
         The aggregated dataset (agg_ser_df).
     """
     # Filter for parking tickets that start on one day and end on the next day and expand them
-    ser_next_day_filtered_df = ser_df[
-        np.not_equal(
-            ser_df["fecha_inicio_dt"].dt.day.values,
-            ser_df["fecha_fin_dt"].dt.day.values,
-        )
-    ]
-
-    def process_parking_dates(row):
-        start = row["fecha_inicio_dt"]
-        end = row["fecha_fin_dt"]
-        barrio_id = row["barrio_id"]
-        tipo_zona = row["tipo_zona"]
-        segments = []
-
-        # Take into account Saturdays and August schedule
-        no_parking_start_hour = 14 if start.month == 8 or start.dayofweek == 5 else 20
-
-        no_parking_start = pd.Timestamp(
-            year=start.year,
-            month=start.month,
-            day=start.day,
-            hour=no_parking_start_hour,
-            minute=59,
-        )
-        no_parking_end = pd.Timestamp(
-            year=end.year, month=end.month, day=end.day, hour=9, minute=0
-        )
-
-        segments.append(
-            {
-                "fecha_inicio_dt": start,
-                "fecha_fin_dt": no_parking_start,
-                "barrio_id": barrio_id,
-                "tipo_zona": tipo_zona,
-            }
-        )
-        segments.append(
-            {
-                "fecha_inicio_dt": no_parking_end,
-                "fecha_fin_dt": end,
-                "barrio_id": barrio_id,
-                "tipo_zona": tipo_zona,
-            }
-        )
-
-        return segments
-
-    expanded_rows = ser_next_day_filtered_df.progress_apply(
-        process_parking_dates, axis=1
+    columns = ["fecha_inicio_dt", "fecha_fin_dt", "barrio_id", "tipo_zona"]
+    crosses_midnight = np.not_equal(
+        ser_df["fecha_inicio_dt"].dt.day.values,
+        ser_df["fecha_fin_dt"].dt.day.values,
+    )
+    ser_next_day_filtered_df = ser_df.loc[crosses_midnight, columns]
+
+    # Each of them is split into the part before the no-parking period, which
+    # starts at 14:59 on Saturdays and in August (20:59 otherwise), and the
+    # part after it ends at 09:00 of the end day. Computed on whole columns, so
+    # both parts are built with a single concatenation
+    start = ser_next_day_filtered_df["fecha_inicio_dt"]
+    end = ser_next_day_filtered_df["fecha_fin_dt"]
+    no_parking_start_hour = np.where(
+        (start.dt.month == 8) | (start.dt.dayofweek == 5), 14, 20
     )
-    ser_expanded_df = pd.DataFrame(
-        [item for sublist in expanded_rows for item in sublist]
+    no_parking_start = (
+        start.dt.normalize()
+        + pd.to_timedelta(no_parking_start_hour, unit="h")
+        + pd.Timedelta(minutes=59)
+    )
+    no_parking_end = end.dt.normalize() + pd.Timedelta(hours=9)
+    ser_expanded_df = pd.concat(
+        [
+            ser_next_day_filtered_df.assign(fecha_fin_dt=no_parking_start),
+            ser_next_day_filtered_df.assign(fecha_inicio_dt=no_parking_end),
+        ],
+        ignore_index=True,
     )
 
     # Concatenate the expanded DataFrame with the non-filtered DataFrame
-    next_day_filtered_indices = ser_next_day_filtered_df.index
-    ser_non_filtered_df = ser_df.loc[~ser_df.index.isin(next_day_filtered_indices)][
-        ["fecha_inicio_dt", "fecha_fin_dt", "barrio_id", "tipo_zona"]
-    ]
+    ser_non_filtered_df = ser_df.loc[~crosses_midnight, columns]
 
     pre_agg_ser_df = pd.concat(
         [ser_non_filtered_df, ser_expanded_df], ignore_index=True
@@ -92,74 +63,77 @@ def data_aggregator(
     # Filter for parking tickets that are in the blue and green zones
     pre_agg_ser_df = pre_agg_ser_df[pre_agg_ser_df["tipo_zona"].isin(["AZUL", "VERDE"])]
 
-    def create_barrio_agg_ser_df(df: pd.DataFrame) -> pd.DataFrame:
-        start_times = df["fecha_inicio_dt"].dt.floor("h").value_counts().sort_index()
+    # Count the active tickets of every (tipo_zona, barrio_id) group and hour
+    # in a single sweep. Each group gets the range of hours from its first
+    # ticket start to its last ticket end, all laid out one after another in
+    # a single array; starts add one at their hour and ends subtract one at
+    # the hour after, and a cumulative sum gives the active tickets
+    if (
+        pre_agg_ser_df["fecha_inicio_dt"].isna().any()
+        or pre_agg_ser_df["fecha_fin_dt"].isna().any()
+    ):
+        logger.error("Start or end date is NaT")
+        raise ValueError("Start or end date is NaT. Please check your input data.")
+
+    zona_codes, zonas = pd.factorize(pre_agg_ser_df["tipo_zona"])
+    barrio_codes, barrios = pd.factorize(pre_agg_ser_df["barrio_id"])
+    # Tickets without a `barrio_id` do not belong to any group
+    has_barrio = barrio_codes >= 0
+    group_codes, ticket_groups = np.unique(
+        zona_codes[has_barrio] * len(barrios) + barrio_codes[has_barrio],
+        return_inverse=True,
+    )
 
-        end_times = (
-            (df["fecha_fin_dt"] + pd.Timedelta(hours=1))
-            .dt.floor("h")
-            .value_counts()
-            .sort_index()
-        )
-        time_changes = (start_times.subtract(end_times, fill_value=0)).cumsum()
-
-        start_date = df["fecha_inicio_dt"].min().floor("h")
-        end_date = (df["fecha_fin_dt"].max() + pd.Timedelta(hours=1)).floor("h")
-
-        if pd.isnull(start_date) or pd.isnull(end_date):
-            logger.error("Start or end date is NaT")
-            raise ValueError("Start or end date is NaT. Please check your input data.")
-
-        try:
-            time_range = pd.date_range(
-                start=start_date,
-                end=end_date,
-                freq="h",
-            )
-        except Exception as e:
-            logger.error(f"Error creating time_range: {str(e)}")
-            raise
-
-        agg_ser_df = (
-            time_changes.reindex(time_range, method="ffill")
-            .fillna(0)
-            .to_frame(name="active_tickets")
-        )
-        return agg_ser_df
-
-    all_barrio_zona_dfs = []
-    for tipo_zona in tqdm(pre_agg_ser_df["tipo_zona"].unique()):
-        for barrio_id in tqdm(pre_agg_ser_df["barrio_id"].unique()):
-            barrio_zona_df = pre_agg_ser_df[
-                (pre_agg_ser_df["barrio_id"] == barrio_id)
-                & (pre_agg_ser_df["tipo_zona"] == tipo_zona)
-            ].reset_index(drop=True)
-
-            if barrio_zona_df.empty:
-                logger.info(
-                    f"Skipping barrio_id {barrio_id} and tipo_zona {tipo_zona} as it has no data"
-                )
-                continue
-
-            barrio_zona_agg_ser_df = create_barrio_agg_ser_df(barrio_zona_df).assign(
-                barrio_id=barrio_id, tipo_zona=tipo_zona
-            )
-            all_barrio_zona_dfs.append(barrio_zona_agg_ser_df)
-
-    agg_ser_df = pd.concat(all_barrio_zona_dfs).assign(
-        active_tickets=lambda df: np.where(df.index.hour == 21, 0, df["active_tickets"])
+    start_hours = (
+        pre_agg_ser_df["fecha_inicio_dt"].values[has_barrio].astype("datetime64[h]")
+    ).astype(np.int64)
+    end_hours = (
+        (pre_agg_ser_df["fecha_fin_dt"].values[has_barrio] + np.timedelta64(1, "h"))
+        .astype("datetime64[h]")
+        .astype(np.int64)
+    )
+    first_hours = pd.Series(start_hours).groupby(ticket_groups).min().values
+    last_hours = pd.Series(end_hours).groupby(ticket_groups).max().values
+    num_hours = last_hours - first_hours + 1
+
+    # Split tickets may end before they start. Their ends before the range
+    # count from its first hour, and their starts after it go to an extra
+    # slot past the end of the range, so every ticket adds and subtracts
+    # within its group's slots and the sum is back to zero at the next group
+    offsets = np.concatenate([[0], np.cumsum(num_hours + 1)[:-1]])
+    ticket_offsets = offsets[ticket_groups] - first_hours[ticket_groups]
+    num_slots = int(offsets[-1] + num_hours[-1] + 1)
+    start_slots = ticket_offsets + np.minimum(
+        start_hours, last_hours[ticket_groups] + 1
+    )
+    end_slots = ticket_offsets + np.maximum(end_hours, first_hours[ticket_groups])
+    active_tickets = np.cumsum(
+        np.bincount(start_slots, minlength=num_slots)
+        - np.bincount(end_slots, minlength=num_slots)
+    )
+
+    hour_groups = np.repeat(np.arange(len(group_codes)), num_hours)
+    hour_indices = np.arange(len(hour_groups)) - np.repeat(
+        np.cumsum(num_hours) - num_hours, num_hours
+    )
+    active_tickets = active_tickets[offsets[hour_groups] + hour_indices]
+    hours = first_hours[hour_groups] + hour_indices
+    agg_ser_df = pd.DataFrame(
+        {
+            "active_tickets": active_tickets.astype(float),
+            "barrio_id": barrios[group_codes % len(barrios)][hour_groups],
+            "tipo_zona": zonas[group_codes // len(barrios)][hour_groups],
+        },
+        index=pd.DatetimeIndex(hours.astype("datetime64[h]").astype("datetime64[ns]")),
     )
 
-    agg_ser_df.loc[
-        (agg_ser_df.index.hour == 15) & (agg_ser_df.index.dayofweek == 5),
-        "active_tickets",
-    ] = 0
-    agg_ser_df.loc[
-        (agg_ser_df.index.hour == 15)
-        & (agg_ser_df.index.month == 8)
-        & (agg_ser_df.index.dayofweek < 5),
-        "active_tickets",
-    ] = 0
+    # No tickets are active outside the SER schedule, with the same rules
+    # applied by the models at inference time
+    agg_ser_df = agg_ser_df.assign(
+        active_tickets=lambda df: np.where(
+            closed_hours_mask(df.index.values), 0, df["active_tickets"]
+        )
+    )
 
     agg_ser_df = agg_ser_df[
         (
@@ -1,49 +1,105 @@
+from typing import Dict, Optional
+
 import pandas as pd
 from typing_extensions import Annotated
 from zenml import step
 from zenml.logger import get_logger
 
-from utils.config import get_data_paths
+from utils.config import get_data_paths, get_ingest_cache_uri
 from utils.data_loader import standardize_parking_columns
 from utils.data_sources import get_data_source
+from utils.ingest_cache import IngestCache
 
 logger = get_logger(__name__)
 
 logger.info("Loading data...")
 DATA_SOURCE = get_data_source()
 PARKINGS_DATA_PATH, SPACES_DATA_PATH = get_data_paths()
+INGEST_CACHE_URI = get_ingest_cache_uri()
+
+# Columns of the parkings data used by the preprocessor
+PARKINGS_COLUMNS = [
+    "fecha_inicio",
+    "fecha_fin",
+    "barrio",
+    "codigo_distrito",
+    "codigo_barrio",
+    "tipo_zona",
+]
+
+
+def parkings_source_fingerprints() -> Dict[str, str]:
+    """
+    Fingerprint the monthly parkings CSV files, to be passed to
+    `parkings_data_loader` so its cache is invalidated when any file is added,
+    changed or removed.
+
+    Returns:
+        Dict mapping the path of every CSV file to its fingerprint.
+    """
+    return DATA_SOURCE.list_csv_fingerprints(PARKINGS_DATA_PATH)
+
+
+def _load_parkings_csv(file_path: str) -> pd.DataFrame:
+    logger.info(f"Loading {file_path}...")
+    df = DATA_SOURCE.load_csv(
+        file_path=file_path,
+        delimiter=";",
+        encoding="UTF-8",
+    )
+    df = standardize_parking_columns(df)
+    # Stored typed, so the dates are parsed only once per file
+    return df.assign(
+        fecha_inicio=lambda df: pd.to_datetime(df["fecha_inicio"]),
+        fecha_fin=lambda df: pd.to_datetime(df["fecha_fin"]),
+    )
 
 
 @step(enable_cache=True)
-def parkings_data_loader() -> Annotated[pd.DataFrame, "raw_ser_df"]:
+def parkings_data_loader(
+    source_fingerprints: Optional[Dict[str, str]] = None,
+) -> Annotated[pd.DataFrame, "raw_ser_df"]:
     """
     Load the parking data from the configured data source, in
     an agnostic way to the data source.
 
+    If an ingest cache is configured, every CSV file is converted once to
+    Parquet in it and only new or changed files are parsed again. Only the
+    columns used by the preprocessor are returned.
+
     Args:
-        path: Path where the parkings data is stored.
+        source_fingerprints: Fingerprints of the CSV files, computed when the
+            pipeline is built so the step cache follows the source files.
+            Computed here if not given.
 
     Returns:
         The parkings dataset as a Pandas DataFrame.
     """
     logger.info(f"Loading data from {DATA_SOURCE} at {PARKINGS_DATA_PATH}...")
-    csv_file_paths = DATA_SOURCE.list_csv_files(PARKINGS_DATA_PATH)
+    if source_fingerprints is None:
+        source_fingerprints = parkings_source_fingerprints()
     logger.info(
-        f"Found this number of CSV files {len(csv_file_paths)}: {csv_file_paths}"
+        f"Found this number of CSV files {len(source_fingerprints)}: {list(source_fingerprints)}"
     )
 
-    dfs = []
-    for file_path in csv_file_paths:
-        logger.info(f"Loading {file_path}...")
-        df = DATA_SOURCE.load_csv(
-            file_path=file_path,
-            delimiter=";",
-            encoding="UTF-8",
-        )
-        df = standardize_parking_columns(df)
-        dfs.append(df)
-
-    return pd.concat(dfs, ignore_index=True)
+    if INGEST_CACHE_URI is None:
+        logger.info("No ingest cache configured, parsing all the CSV files...")
+        return pd.concat(
+            [
+                _load_parkings_csv(file_path)
+                for file_path in sorted(source_fingerprints)
+            ],
+            ignore_index=True,
+        ).reindex(columns=PARKINGS_COLUMNS)
+
+    logger.info(f"Using the ingest cache at {INGEST_CACHE_URI}")
+    ingest_cache = IngestCache(INGEST_CACHE_URI)
+    converted = ingest_cache.update(source_fingerprints, _load_parkings_csv)
+    logger.info(
+        f"Converted {len(converted)} new or changed CSV files, "
+        f"{len(source_fingerprints) - len(converted)} read from the ingest cache"
+    )
+    return ingest_cache.read(columns=PARKINGS_COLUMNS)
 
 
 @step
@@ -1,14 +1,12 @@
 from typing import Tuple
 
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
 from typing_extensions import Annotated
 from unidecode import unidecode
 from zenml import step
 from zenml.logger import get_logger
 
-tqdm.pandas(desc="Processing rows")
-
 logger = get_logger(__name__)
 
 
@@ -72,16 +70,29 @@ def parkings_data_preprocessor(
             text = unidecode(text.strip())
         return text
 
+    # There are only a few hundred distinct `barrio` values, so each of them is
+    # cleaned once and mapped back to the rows through its code
+    barrio_codes, raw_barrios = pd.factorize(ser_df["barrio"])
+    barrios = pd.Index([clean_barrio(barrio) for barrio in raw_barrios], dtype=object)
+    barrio_ids = pd.array(barrios.map(barrio_to_id_map), dtype="Int16")
+
+    # Fix specific `barrio` values
+    barrios = barrios.where(barrios != "PILAR", "EL PILAR")
+    category_codes, categories = pd.factorize(barrios)
+
     ser_df = ser_df.assign(
-        barrio=lambda df: df["barrio"].progress_apply(clean_barrio),
-        barrio_id=lambda df: df["barrio"].map(barrio_to_id_map),
+        barrio=pd.Categorical.from_codes(
+            np.where(barrio_codes >= 0, category_codes[barrio_codes], -1),
+            categories,
+        ),
+        barrio_id=barrio_ids.take(barrio_codes, allow_fill=True),
+        tipo_zona=lambda df: df["tipo_zona"].astype("category"),
     )
 
-    # Fix specific `barrio` values and remove unwanted ones
-    ser_df.loc[ser_df["barrio"] == "PILAR", "barrio"] = "EL PILAR"
+    # Remove unwanted `barrio` values
     ser_df = ser_df[
         ~ser_df["barrio"].isin(["ELO MONITORIZACION 1", "TALLER DEVAS", "TEST PARKARE"])
-    ]
+    ].assign(barrio=lambda df: df["barrio"].cat.remove_unused_categories())
 
     ser_df.reset_index(drop=True, inplace=True)
 
@@ -1,11 +1,9 @@
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
 from typing_extensions import Annotated
 from zenml import step
 from zenml.logger import get_logger
 
-tqdm.pandas(desc="Processing rows")
-
 logger = get_logger(__name__)
 
 
@@ -25,62 +23,57 @@ def data_tuner(
         The tuned dataset (tuned_ser_df).
     """
 
-    def _fix_active_tickets(row, spaces_grouped_df, max_active_tickets: dict):
-        barrio_id = row.barrio_id
-        hour = row.name.hour
-        active_tickets = row.active_tickets
-
-        barrio_data = spaces_grouped_df[spaces_grouped_df["barrio_id"] == barrio_id]
-        if barrio_data.empty:
-            return active_tickets  # Return original value if `barrio_id` not found
-
-        num_plazas_verdes_barrio = barrio_data["num_plazas_verdes"].iloc[0]
-        num_plazas_azules_barrio = barrio_data["num_plazas_azules"].iloc[0]
-
-        if barrio_id not in [101, 102, 103, 104, 105, 106]:
-            # Avoid division by zero
-            if num_plazas_azules_barrio == 0:
-                return active_tickets
-
-            hourly_factor_initial = (
-                -0.01084 * (num_plazas_verdes_barrio / num_plazas_azules_barrio)
-            ) + 0.9
-
-            hourly_factors = {
-                9: hourly_factor_initial,
-                10: hourly_factor_initial,
-                11: hourly_factor_initial,
-                12: hourly_factor_initial,
-                13: hourly_factor_initial,
-                14: hourly_factor_initial,
-                15: hourly_factor_initial,
-                16: hourly_factor_initial + 0.05,
-                17: hourly_factor_initial + 0.15,
-                18: hourly_factor_initial + 0.2,
-                19: hourly_factor_initial + 0.25,
-                20: hourly_factor_initial + 0.3,
-            }
-
-            factor = hourly_factors.get(hour, 1.0)
-
-            return active_tickets * factor
-
-        else:
-            max_active_tickets_barrio = max_active_tickets[barrio_id]
-            delta = num_plazas_verdes_barrio - max_active_tickets_barrio
-            return active_tickets + delta
+    # Capacity of the barrio of every row, NaN where the barrio has no spaces
+    # data (those rows keep their original value)
+    capacity = (
+        spaces_grouped_df.drop_duplicates("barrio_id")
+        .set_index("barrio_id")[["num_plazas_verdes", "num_plazas_azules"]]
+        .reindex(agg_ser_df["barrio_id"].values)
+    )
+    num_plazas_verdes = capacity["num_plazas_verdes"].values
+    num_plazas_azules = capacity["num_plazas_azules"].values
+    active_tickets = agg_ser_df["active_tickets"].values
+    hours = agg_ser_df.index.hour.values
+
+    # Blue zone barrios: active tickets scaled by a factor growing through the
+    # afternoon, from 09:00 to 20:00, and unchanged at other hours
+    hourly_factor_increase = np.full(24, np.nan)
+    hourly_factor_increase[9:16] = 0
+    hourly_factor_increase[16:21] = [0.05, 0.15, 0.2, 0.25, 0.3]
+    # Barrios without blue spaces are left unchanged, avoiding the division by
+    # zero
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hourly_factor_initial = (
+            -0.01084 * (num_plazas_verdes / num_plazas_azules)
+        ) + 0.9
+        factor = np.where(
+            np.isnan(hourly_factor_increase[hours]),
+            1.0,
+            hourly_factor_initial + hourly_factor_increase[hours],
+        )
+        blue_tuned = np.where(
+            num_plazas_azules == 0, active_tickets, active_tickets * factor
+        )
 
-    # Create the new DataFrame and apply the `fix_active_tickets` function
+    # Green zone barrios: active tickets shifted so their maximum matches the
+    # number of green spaces
     max_active_tickets = (
         agg_ser_df.groupby("barrio_id")["active_tickets"]
         .quantile(1)
-        .sort_values(ascending=False)
-        .to_dict()
+        .reindex(agg_ser_df["barrio_id"].values)
+        .values
     )
+    green_tuned = active_tickets + (num_plazas_verdes - max_active_tickets)
+
     tuned_ser_df = agg_ser_df.assign(
-        active_tickets=lambda df: df.progress_apply(
-            lambda row: _fix_active_tickets(row, spaces_grouped_df, max_active_tickets),
-            axis=1,
+        active_tickets=np.where(
+            np.isnan(num_plazas_verdes),
+            active_tickets,
+            np.where(
+                agg_ser_df["barrio_id"].isin([101, 102, 103, 104, 105, 106]).values,
+                green_tuned,
+                blue_tuned,
+            ),
         )
     )
 
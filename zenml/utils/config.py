@@ -1,5 +1,5 @@
 import os
-from typing import Tuple
+from typing import Optional, Tuple
 
 from dotenv import load_dotenv
 from zenml.client import Client
@@ -22,6 +22,10 @@ if "aws" not in secret_names:
             "PARKINGS_S3_DATA_PATH": os.getenv("PARKINGS_S3_DATA_PATH"),
             "SPACES_LOCAL_DATA_PATH": os.getenv("SPACES_LOCAL_DATA_PATH"),
             "SPACES_S3_DATA_PATH": os.getenv("SPACES_S3_DATA_PATH"),
+            "PARKINGS_LOCAL_INGEST_CACHE_PATH": os.getenv(
+                "PARKINGS_LOCAL_INGEST_CACHE_PATH"
+            ),
+            "PARKINGS_S3_INGEST_CACHE_URI": os.getenv("PARKINGS_S3_INGEST_CACHE_URI"),
         },
     )
 
@@ -46,3 +50,24 @@ def get_data_paths() -> Tuple[str, str]:
         parkings_local_data_path = secret_values["PARKINGS_LOCAL_DATA_PATH"]
         spaces_local_data_path = secret_values["SPACES_LOCAL_DATA_PATH"]
         return parkings_local_data_path, spaces_local_data_path
+
+
+def get_ingest_cache_uri() -> Optional[str]:
+    """
+    Return the location of the Parquet ingest cache of the parkings data based
+    on the active ZenML stack configuration. It is kept apart from the raw
+    data, so the source files are never written to.
+
+    Returns:
+        Optional[str]: Local directory or S3 URI ("s3://bucket/prefix") of the
+            ingest cache, or None if it is not configured.
+    """
+    client = Client()
+    stack = client.active_stack
+    artifact_store = stack._artifact_store
+    secret_values = client.get_secret("aws").secret_values
+
+    # Read with get, secrets created before the cache existed lack the keys
+    if isinstance(artifact_store, S3ArtifactStore):
+        return secret_values.get("PARKINGS_S3_INGEST_CACHE_URI") or None
+    return secret_values.get("PARKINGS_LOCAL_INGEST_CACHE_PATH") or None
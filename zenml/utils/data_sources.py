@@ -1,7 +1,7 @@
 import os
 from abc import ABC, abstractmethod
 from io import StringIO
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 import boto3
 import pandas as pd
@@ -19,6 +19,7 @@ class DataSource(ABC):
     Methods:
         load_csv: Load a CSV file.
         list_files: List all files in a given path.
+        list_csv_fingerprints: Fingerprint all CSV files in a given path.
     """
 
     @abstractmethod
@@ -34,6 +35,20 @@ class DataSource(ABC):
         """
         pass
 
+    @abstractmethod
+    def list_csv_fingerprints(self, path: str) -> Dict[str, str]:
+        """
+        Fingerprint the contents of all CSV files in a given path.
+
+        Args:
+            path: Path to the directory containing the CSV files.
+
+        Returns:
+            Dict mapping the path of every CSV file to a string that changes
+                whenever its contents do.
+        """
+        pass
+
     @abstractmethod
     def list_csv_files(self, path: str, delimiter: Optional[str] = None) -> List[str]:
         """
@@ -128,6 +143,23 @@ class LocalDataSource(DataSource):
         logger.info(f"Found the following files in path {path}: {csv_file_paths}")
         return csv_file_paths
 
+    def list_csv_fingerprints(self, path: str) -> Dict[str, str]:
+        """
+        Fingerprint all CSV files in a given path by their size and
+        modification time.
+
+        Args:
+            path: Path to the directory containing the CSV files.
+
+        Returns:
+            Dict mapping the path of every CSV file to its fingerprint.
+        """
+        fingerprints = {}
+        for file_path in self.list_csv_files(path):
+            stat = os.stat(file_path)
+            fingerprints[file_path] = f"{stat.st_size}-{stat.st_mtime_ns}"
+        return fingerprints
+
 
 class S3DataSource(DataSource):
     """
@@ -184,6 +216,24 @@ class S3DataSource(DataSource):
             if content["Key"].endswith(".csv")
         ]
 
+    def list_csv_fingerprints(self, path: str) -> Dict[str, str]:
+        """
+        Fingerprint all CSV files in a given path by their ETag, returned by
+        the same listing request.
+
+        Args:
+            path: Path to the directory in the S3 bucket.
+
+        Returns:
+            Dict mapping the key of every CSV file to its ETag.
+        """
+        response = self.s3.list_objects_v2(Bucket=self.bucket_name, Prefix=path)
+        return {
+            content["Key"]: content["ETag"].strip('"')
+            for content in response.get("Contents", [])
+            if content["Key"].endswith(".csv")
+        }
+
 
 def get_data_source() -> DataSource:
     """
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import fs
+from zenml.logger import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+
+class IngestCache:
+    """
+    Columnar cache of source CSV files, each converted once to Parquet.
+
+    A manifest maps every source file to its Parquet file and to the
+    fingerprint of the source contents it was converted from (ETag, or size
+    and modification time), so only new or changed files are parsed again.
+
+    Attributes:
+        uri: Local directory or S3 URI ("s3://bucket/prefix") of the cache.
+    """
+
+    def __init__(self, uri: str):
+        self.uri = uri if "://" in uri else os.path.abspath(uri)
+        self.filesystem, self.path = fs.FileSystem.from_uri(self.uri)
+        self.filesystem.create_dir(self.path, recursive=True)
+        self.manifest = self._read_manifest()
+
+    def _file_path(self, file_name: str) -> str:
+        return f"{self.path.rstrip('/')}/{file_name}"
+
+    def _read_manifest(self) -> Dict[str, Dict]:
+        manifest_path = self._file_path(MANIFEST_FILE_NAME)
+        if self.filesystem.get_file_info(manifest_path).type == fs.FileType.NotFound:
+            return {}
+        with self.filesystem.open_input_stream(manifest_path) as manifest_file:
+            return json.loads(manifest_file.read().decode("utf-8"))
+
+    def _write_manifest(self) -> None:
+        manifest_path = self._file_path(MANIFEST_FILE_NAME)
+        # Written aside and moved into place, so an interrupted run never
+        # leaves a truncated manifest
+        tmp_path = f"{manifest_path}.tmp"
+        with self.filesystem.open_output_stream(tmp_path) as manifest_file:
+            manifest_file.write(
+                json.dumps(self.manifest, indent=2, sort_keys=True).encode("utf-8")
+            )
+        self.filesystem.move(tmp_path, manifest_path)
+
+    def update(
+        self,
+        fingerprints: Dict[str, str],
+        load_csv: Callable[[str], pd.DataFrame],
+    ) -> List[str]:
+        """
+        Convert the new or changed source files to Parquet and drop the ones
+        no longer present.
+
+        Args:
+            fingerprints: Fingerprint of every current source file, by path.
+            load_csv: Function loading a source file as a DataFrame.
+
+        Returns:
+            Paths of the source files converted.
+        """
+        converted = []
+        for source_path, fingerprint in sorted(fingerprints.items()):
+            entry = self.manifest.get(source_path)
+            if entry is not None and entry["fingerprint"] == fingerprint:
+                continue
+            logger.info(f"Converting {source_path} to Parquet...")
+            df = load_csv(source_path)
+            file_name = (
+                hashlib.sha1(f"{source_path}:{fingerprint}".encode("utf-8")).hexdigest()
+                + ".parquet"
+            )
+            pq.write_table(
+                pa.Table.from_pandas(df, preserve_index=False),
+                self._file_path(file_name),
+                filesystem=self.filesystem,
+            )
+            if entry is not None:
+                self._delete(entry["parquet"])
+            self.manifest[source_path] = {
+                "fingerprint": fingerprint,
+                "parquet": file_name,
+                "rows": len(df),
+            }
+            # Saved after every file, so a failed run keeps the ones done
+            self._write_manifest()
+            converted.append(source_path)
+
+        removed = [path for path in self.manifest if path not in fingerprints]
+        for source_path in removed:
+            logger.info(f"{source_path} no longer exists, removing it from the cache")
+            self._delete(self.manifest.pop(source_path)["parquet"])
+        if removed:
+            self._write_manifest()
+        return converted
+
+    def _delete(self, file_name: str) -> None:
+        try:
+            self.filesystem.delete_file(self._file_path(file_name))
+        except FileNotFoundError:
+            pass
+
+    def read(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read the cached files, in source path order.
+
+        Args:
+            columns: Columns to read, all of them if not given.
+
+        Returns:
+            DataFrame with the data of all the cached files.
+        """
+        dfs = []
+        for source_path in sorted(self.manifest):
+            parquet_path = self._file_path(self.manifest[source_path]["parquet"])
+            present_columns = None
+            if columns is not None:
+                # Files missing a column get it filled with nulls, as a concat
+                # of the CSV files did
+                schema = pq.read_schema(parquet_path, filesystem=self.filesystem)
+                present_columns = [
+                    column for column in columns if column in schema.names
+                ]
+            dfs.append(
+                pq.read_table(
+                    parquet_path, columns=present_columns, filesystem=self.filesystem
+                ).to_pandas()
+            )
+        if not dfs:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(dfs, ignore_index=True)
+        return df if columns is None else df.reindex(columns=columns)